@@ -0,0 +1,274 @@
+import os
+
+# Batch runs never open a window; pick the non-interactive backend before the
+# matplotlib composite mode pulls in matplotlib.pyplot so no GUI toolkit is imported.
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import csv
+import time
+import numpy as np
+import composite
+import image_io
+import profiling
+
+def closing_pipeline(img):
+    """Task 1: blur followed by closing with K=2 and K=3."""
+    import task_1_blurring
+    steps = task_1_blurring.process_image(img)
+    return {"closing_k2": steps[1][1], "closing_k3": steps[2][1]}
+
+def nlm_sobel_pipeline(img, denoised=None):
+    """Task 1: non-local means denoising followed by line enhancement."""
+    import task_1_denoise
+    steps = dict(task_1_denoise.process_image(img, denoised))
+    return {
+        "denoised": steps["Denoised"],
+        "enhanced_closing": steps["Enhanced (Closing)"],
+        "enhanced_edge": steps["Enhanced (Edge detection)"],
+    }
+
+def task_2_speckle_input(img):
+    """Task 2 preprocessing shared by the serial and parallel speckle paths."""
+    import task_2_speckle
+    return task_2_speckle.preprocess_image(img)
+
+def speckle_pipeline(img):
+    """Task 2: median, bilateral, Crimmins and myMethod filters."""
+    import task_2_speckle
+    return task_2_speckle.apply_speckle_filters(task_2_speckle_input(img))
+
+def auto_pipeline(img):
+    """Only the filter the noise estimate picks for this image (see noise.py)."""
+    import noise
+    denoised, _, _ = noise.auto_denoise(img)
+    return {"auto": denoised}
+
+PIPELINES = {
+    "closing": closing_pipeline,
+    "nlm_sobel": nlm_sobel_pipeline,
+    "speckle": speckle_pipeline,
+    "auto": auto_pipeline,
+}
+
+def closing_composite(img, outputs, diffs=None):
+    import task_1_blurring
+    img = task_1_blurring.preprocess_image(img)
+    return [[("Original", img), ("Closing K=2", outputs["closing_k2"]), ("Closing K=3", outputs["closing_k3"])]]
+
+def nlm_sobel_composite(img, outputs, diffs=None):
+    return [[("Original", img), ("Denoised", outputs["denoised"]),
+             ("Enhanced (Closing)", outputs["enhanced_closing"]), ("Enhanced (Edge detection)", outputs["enhanced_edge"])]]
+
+def speckle_composite(img, outputs, diffs=None):
+    import task_2_speckle
+    if diffs is None:
+        diffs, _ = task_2_speckle.compare_filters(img, outputs)
+    return task_2_speckle.comparison_rows(img, outputs, diffs)
+
+def auto_composite(img, outputs, diffs=None):
+    return [[("Original", img), ("Auto-selected filter", outputs["auto"])]]
+
+# Pipeline -> rows of (label, image) for its comparison composite; diffs are
+# the speckle difference images when metrics already computed them. For
+# speckle, img is the preprocessed input (see run_batch)
+COMPOSITES = {
+    "closing": closing_composite,
+    "nlm_sobel": nlm_sobel_composite,
+    "speckle": speckle_composite,
+    "auto": auto_composite,
+}
+
+def output_stem(input_path, input_dir, output_dir):
+    """Output path prefix for an input image, mirroring the input tree layout."""
+    relative = os.path.relpath(input_path, input_dir)
+    target_dir = os.path.join(output_dir, os.path.dirname(relative))
+    os.makedirs(target_dir, exist_ok=True)
+    return os.path.join(target_dir, os.path.basename(relative))
+
+def save_outputs(outputs, input_path, input_dir, output_dir):
+    """Write each result array as .npy, mirroring the input tree layout."""
+    stem = output_stem(input_path, input_dir, output_dir)
+    with profiling.stage("save", image=input_path):
+        for name, array in outputs.items():
+            np.save(f"{stem}_{name}.npy", array)
+
+def nlm_sobel_batched(images, chunk_size, mode="exact"):
+    """Denoise chunks of images in one batched NLM call, then finish each image."""
+    import nlm
+
+    def flush(chunk):
+        # Each image's share of the batched call is recorded under its own path
+        denoised = nlm.denoise_batch([img for _, img in chunk], nlm.DEFAULT_H, nlm.DEFAULT_TEMPLATE_WINDOW,
+                                     nlm.DEFAULT_SEARCH_WINDOW, mode=mode, labels=[path for path, _ in chunk])
+        for (path, img), result in zip(chunk, denoised):
+            with profiling.image(path):
+                outputs = nlm_sobel_pipeline(img, result)
+            yield path, outputs
+
+    chunk = []
+    for item in images:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield from flush(chunk)
+            chunk = []
+    if chunk:
+        yield from flush(chunk)
+
+def run_profiled(func, path, img):
+    """Run one pipeline with its stages attributed to the image when profiling."""
+    with profiling.image(path):
+        return func(img)
+
+def prepare_speckle(path, img):
+    """Speckle preprocessing, attributed to the image without a second "image" span."""
+    with profiling.image(path, span=False):
+        return task_2_speckle_input(img)
+
+def remember(images, originals):
+    """Pass (path, img) pairs through, keeping each image until its composite is written."""
+    for path, img in images:
+        originals[path] = img
+        yield path, img
+
+def speckle_metrics(img, outputs, path):
+    """Quality metrics of every speckle filter output against its preprocessed input, as (diffs, records)."""
+    import task_2_speckle
+    diffs, records = task_2_speckle.compare_filters(img, outputs)
+    return diffs, [{"image": path, "filter": name, **record} for name, record in records.items()]
+
+def write_metrics(records, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[0]))
+        writer.writeheader()
+        writer.writerows(records)
+
+def run_batch(pipeline, input_dir, output_dir, workers=1, verbose=True, nlm_mode="exact", nlm_chunk=8,
+              composites=None, composite_format="png", metrics=None):
+    """Apply a pipeline to every image under input_dir and return run statistics.
+
+    composites is a composite.CompositeWriter or FigureWriter; when given,
+    a <image>_composite.<format> comparison is written next to the arrays.
+    metrics is a list that receives one quality record per image and filter
+    (speckle pipeline only).
+    """
+    processed, failed = 0, []
+    megapixels = 0.0
+    start = time.perf_counter()
+
+    # tracemalloc peaks count every thread, so no decoding runs alongside a recorded stage
+    prefetch = 0 if profiling.tracks_memory() else image_io.DEFAULT_PREFETCH
+    images = image_io.iter_images(image_io.find_images(input_dir), prefetch=prefetch, failed=failed,
+                                  verbose=verbose)
+    if pipeline == "speckle":
+        # Preprocessed once here; the filters, metrics and composite all start from it
+        images = ((path, prepare_speckle(path, img)) for path, img in images)
+    originals = {}
+    if composites is not None or metrics is not None:
+        images = remember(images, originals)
+    if workers > 1 and pipeline == "speckle":
+        from parallel import run_speckle_parallel
+        results = run_speckle_parallel(images, workers)
+    elif pipeline == "speckle":
+        import task_2_speckle
+        results = ((path, run_profiled(task_2_speckle.apply_speckle_filters, path, img)) for path, img in images)
+    elif pipeline == "nlm_sobel":
+        results = nlm_sobel_batched(images, nlm_chunk, nlm_mode)
+    else:
+        results = ((path, run_profiled(PIPELINES[pipeline], path, img)) for path, img in images)
+
+    for path, outputs in results:
+        save_outputs(outputs, path, input_dir, output_dir)
+        if path in originals:
+            img, diffs = originals.pop(path), None
+            # The pipeline already recorded this image's span
+            with profiling.image(path, span=False):
+                if metrics is not None:
+                    diffs, records = speckle_metrics(img, outputs, path)
+                    metrics.extend(records)
+                if composites is not None:
+                    rows = COMPOSITES[pipeline](img, outputs, diffs)
+                    target = f"{output_stem(path, input_dir, output_dir)}_composite.{composite_format}"
+                    composites.submit(target, rows, os.path.relpath(path, input_dir), image=path)
+        processed += 1
+        megapixels += next(iter(outputs.values())).size / 1e6
+
+    if composites is not None:
+        composites.close()  # Wait for the writer thread
+    elapsed = time.perf_counter() - start
+    stats = {
+        "pipeline": pipeline,
+        "images": processed,
+        "failed": failed,
+        "seconds": elapsed,
+        "images_per_sec": processed / elapsed if elapsed > 0 else 0.0,
+        "megapixels_per_sec": megapixels / elapsed if elapsed > 0 else 0.0,
+    }
+    if verbose:
+        print(f"{pipeline}: {processed} images in {elapsed:.2f}s "
+              f"({stats['images_per_sec']:.2f} images/sec, {stats['megapixels_per_sec']:.2f} MP/sec)")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a processing pipeline over a whole directory tree.")
+    parser.add_argument("pipeline", choices=sorted(PIPELINES))
+    parser.add_argument("input_dir", help="Folder to scan recursively, e.g. noisy/speckle")
+    parser.add_argument("output_dir", help="Folder that receives the .npy result arrays")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes, speckle pipeline only (0 = all cores)")
+    parser.add_argument("--nlm-mode", choices=["exact", "reduced", "downsampled"], default="exact",
+                        help="NLM accuracy/speed trade-off for the nlm_sobel pipeline")
+    parser.add_argument("--nlm-chunk", type=int, default=8, help="Images per batched NLM call")
+    parser.add_argument("--nlm-cache", help="Directory for the on-disk NLM result cache")
+    parser.add_argument("--decode-cache", help="Directory for decoded input images reused across runs")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="Write per-image Chrome traces and a stage summary to DIR")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Also record allocated bytes per stage (tracemalloc, slower; images are "
+                             "then decoded serially)")
+    parser.add_argument("--composite", choices=["mosaic", "matplotlib"],
+                        help="Also write a labelled comparison image per input: fast cv2 mosaic or matplotlib figure")
+    parser.add_argument("--composite-format", choices=["png", "jpg"], default="png")
+    parser.add_argument("--png-compression", type=int, default=composite.DEFAULT_PNG_COMPRESSION,
+                        help="PNG compression level 0-9 for mosaics")
+    parser.add_argument("--jpeg-quality", type=int, default=composite.DEFAULT_JPEG_QUALITY,
+                        help="JPEG quality 0-100 for mosaics")
+    parser.add_argument("--metrics", metavar="CSV",
+                        help="Speckle pipeline: write PSNR, SSIM, residual variance and edge preservation "
+                             "of every filter output to CSV")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+    if args.metrics and args.pipeline != "speckle":
+        parser.error("--metrics is only available for the speckle pipeline")
+    if args.workers != 1 and args.pipeline != "speckle":
+        parser.error("--workers is only available for the speckle pipeline")
+    workers = args.workers or os.cpu_count()
+    if args.profile and workers > 1:
+        parser.error("--profile only records stages run in this process; use it with --workers 1")
+    if args.nlm_cache:
+        import nlm
+        nlm.set_default_cache(nlm.DenoiseCache(args.nlm_cache))
+    if args.decode_cache:
+        image_io.set_default_cache(image_io.DecodeCache(args.decode_cache))
+    if args.profile:
+        profiling.enable(memory=args.profile_memory)
+    writer = None
+    if args.composite == "mosaic":
+        writer = composite.CompositeWriter(args.png_compression, args.jpeg_quality)
+    elif args.composite == "matplotlib":
+        writer = composite.FigureWriter()
+    records = [] if args.metrics else None
+    stats = run_batch(args.pipeline, args.input_dir, args.output_dir, workers, verbose=not args.quiet,
+                      nlm_mode=args.nlm_mode, nlm_chunk=args.nlm_chunk, composites=writer,
+                      composite_format=args.composite_format, metrics=records)
+    if records:
+        write_metrics(records, args.metrics)
+    if args.profile:
+        profiler = profiling.disable()
+        profiler.write(args.profile)
+        profiler.print_summary()
+    if stats["failed"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import time
+import cv2
+import numpy as np
+import image_io
+import metrics
+import noise
+import task_1_denoise
+import task_2_speckle as speckle
+
+# The four filters at their task settings, as run when every filter is tried
+EVERY_FILTER = {
+    "median": lambda img: speckle.apply_median_filter(img, speckle.MEDIAN_KERNEL_SIZE),
+    "bilateral": lambda img: speckle.apply_bilateral_filter(img, speckle.BILATERAL_KERNEL_SIZE,
+                                                            speckle.BILATERAL_SIGMA_COLOR,
+                                                            speckle.BILATERAL_SIGMA_SPACE),
+    "mymethod": speckle.apply_my_method,
+    "nlm": task_1_denoise.denoise_image,
+}
+
+def _grain(rng, shape, grain, sample):
+    """Noise field drawn at 1/grain resolution and interpolated back up, i.e. correlated over grain pixels."""
+    height, width = shape
+    small = sample(rng, (-(-height // grain), -(-width // grain))).astype(np.float32)
+    if grain == 1:
+        return small
+    return cv2.resize(small, (small.shape[1] * grain, small.shape[0] * grain),
+                      interpolation=cv2.INTER_LINEAR)[:height, :width]
+
+def gaussian(sigma, grain=1):
+    def add(clean, rng):
+        return clean + _grain(rng, clean.shape, grain, lambda rng, size: rng.normal(0, sigma, size))
+    return add
+
+def gamma_speckle(looks, grain=1):
+    """Multiplicative gamma speckle with mean 1; fewer looks is stronger."""
+    def add(clean, rng):
+        return clean * _grain(rng, clean.shape, grain, lambda rng, size: rng.gamma(looks, 1 / looks, size))
+    return add
+
+def salt_and_pepper(fraction):
+    def add(clean, rng):
+        noisy = clean.astype(np.float32)
+        hit = rng.random(clean.shape)
+        noisy[hit < fraction / 2] = 0
+        noisy[hit > 1 - fraction / 2] = 255
+        return noisy
+    return add
+
+NOISES = {
+    "gaussian 10": gaussian(10),
+    "gaussian 25": gaussian(25),
+    "gaussian 15, 3 px grain": gaussian(15, 3),
+    "speckle 16 looks": gamma_speckle(16),
+    "speckle 4 looks": gamma_speckle(4),
+    "speckle 8 looks, 3 px grain": gamma_speckle(8, 3),
+    "salt+pepper 2%": salt_and_pepper(0.02),
+    "salt+pepper 10%": salt_and_pepper(0.1),
+}
+
+def without_dots(img):
+    """Line art reference: every dark pixel much darker than all 8 neighbours set to their minimum."""
+    ring = np.ones((3, 3), np.uint8)
+    ring[1, 1] = 0
+    lightest_dark = cv2.erode(img, ring)
+    dots = (img <= 5) & (lightest_dark.astype(np.int16) - img > noise.IMPULSE_JUMP)
+    return np.where(dots, lightest_dark, img)
+
+def cases(speckle_folder, chemical_folder, limit, seed):
+    """(label, clean reference, noisy image): synthetic noise on smoothed photos, and the real line art."""
+    rng = np.random.default_rng(seed)
+    files = image_io.list_images(speckle_folder)[:limit]
+    for name, img in image_io.load_images(speckle_folder, files):
+        # The photos are noisy themselves; smoothed, they serve as the clean reference
+        clean = cv2.GaussianBlur(img, (0, 0), 2.5)
+        for label, add in NOISES.items():
+            noisy = np.clip(add(clean, rng), 0, 255).astype(np.uint8)
+            yield f"{name} {label}", clean, noisy
+    files = image_io.list_images(chemical_folder)[:limit]
+    for name, img in image_io.load_images(chemical_folder, files):
+        yield f"{name} (real dots)", without_dots(img), img
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto-selected filter vs running every filter: time and quality.")
+    parser.add_argument("--speckle", default="noisy/speckle", help="Photos the synthetic noise is added to")
+    parser.add_argument("--chemical", default="noisy/chemical", help="Line art with real isolated dots")
+    parser.add_argument("--limit", type=int, default=3, help="Images taken from each folder")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    names = list(EVERY_FILTER)
+    # Compile the numba kernels and load the libraries before anything is timed
+    warm = np.random.default_rng(args.seed).integers(0, 256, (64, 64)).astype(np.uint8)
+    for func in EVERY_FILTER.values():
+        func(warm)
+    noise.auto_denoise(warm)
+
+    print(f"{'image / noise':>44} {'estimate':>18} {'chosen filter':>16} {'auto s':>7} {'all s':>7} "
+          f"{'auto dB':>8} {'best dB':>8}  " + " ".join(f"{name:>9}" for name in names))
+    totals = {"auto": 0.0, "all": 0.0, "estimate": 0.0}
+    psnrs = {name: [] for name in names + ["auto", "best"]}
+    ssims = {name: [] for name in names + ["auto", "best"]}
+    wins = 0
+    for label, clean, noisy in cases(args.speckle, args.chemical, args.limit, args.seed):
+        estimate, estimate_seconds = timed(noise.estimate_noise, noisy)
+        (auto, _, (choice, params)), auto_seconds = timed(noise.auto_denoise, noisy)
+        scores, all_seconds = {}, 0.0
+        for name, func in EVERY_FILTER.items():
+            output, seconds = timed(func, noisy)
+            all_seconds += seconds
+            scores[name] = (metrics.psnr(clean, output), metrics.ssim(clean, output))
+        best = max(names, key=lambda name: scores[name][0])
+        scores["auto"] = (metrics.psnr(clean, auto), metrics.ssim(clean, auto))
+        scores["best"] = scores[best]
+        wins += scores["auto"][0] >= scores[best][0] - 0.5
+        totals["auto"] += auto_seconds
+        totals["all"] += all_seconds
+        totals["estimate"] += estimate_seconds
+        for name, (psnr, ssim) in scores.items():
+            psnrs[name].append(psnr)
+            ssims[name].append(ssim)
+
+        setting = ",".join(str(value) for value in params.values())
+        print(f"{label[-44:]:>44} {estimate['kind']:>9} s={estimate['sigma']:5.1f}x{estimate['scale']} "
+              f"{choice + '(' + setting + ')':>16} {auto_seconds:>7.2f} {all_seconds:>7.2f} "
+              f"{scores['auto'][0]:>8.2f} {scores[best][0]:>8.2f}  "
+              + " ".join(f"{scores[name][0]:>9.2f}" for name in names))
+
+    count = len(psnrs["auto"])
+    print(f"\n{count} images: auto {totals['auto']:.2f}s (noise estimate {totals['estimate'] * 1e3 / count:.1f} ms "
+          f"per image) vs every filter {totals['all']:.2f}s, {totals['all'] / totals['auto']:.1f}x faster")
+    print(f"auto within 0.5 dB of the best single filter on {wins} of {count} images")
+    print(f"\n{'mean over images':>24} {'PSNR dB':>8} {'SSIM':>6}")
+    for name in ["auto", "best"] + names:
+        label = "best of every filter" if name == "best" else name
+        print(f"{label:>24} {np.mean(psnrs[name]):>8.2f} {np.mean(ssims[name]):>6.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+
+# The matplotlib mode renders figures; benchmarks never open a window.
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import tempfile
+import time
+import composite
+import image_io
+import task_2_speckle
+
+def speckle_rows(images):
+    """Task 2 comparison layouts, computed once so only the rendering is timed."""
+    rows = []
+    for name, img in images:
+        processed = task_2_speckle.apply_speckle_filters(img)
+        diffs = {key: task_2_speckle.calculate_difference_image(img, out) for key, out in processed.items()}
+        rows.append((name, task_2_speckle.comparison_rows(img, processed, diffs)))
+    return rows
+
+def run(writer, rows, folder, extension):
+    """Seconds to write every composite through writer, including the final flush."""
+    start = time.perf_counter()
+    with writer:
+        for name, layout in rows:
+            writer.submit(os.path.join(folder, f"{name}.{extension}"), layout, name)
+    return time.perf_counter() - start
+
+def folder_bytes(folder):
+    return sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+
+def main():
+    parser = argparse.ArgumentParser(description="Matplotlib figures vs cv2 mosaics for the Task 2 comparison output.")
+    parser.add_argument("--folder", default="noisy/speckle")
+    args = parser.parse_args()
+
+    images = image_io.load_images(args.folder, image_io.list_images(args.folder))
+    rows = speckle_rows(images)
+    print(f"{len(rows)} images, 2x5 comparison grid each")
+
+    candidates = [
+        ("matplotlib figure, png", lambda: composite.FigureWriter(figsize=(20, 8)), "png"),
+        ("mosaic, png level 3", lambda: composite.CompositeWriter(png_compression=3), "png"),
+        ("mosaic, png level 1", lambda: composite.CompositeWriter(png_compression=1), "png"),
+        ("mosaic, jpeg quality 90", lambda: composite.CompositeWriter(jpeg_quality=90), "jpg"),
+    ]
+    baseline = None
+    for label, make_writer, extension in candidates:
+        with tempfile.TemporaryDirectory() as tmp:
+            seconds = run(make_writer(), rows, tmp, extension)
+            size = folder_bytes(tmp) / len(rows) / 1e3
+        baseline = baseline or seconds
+        print(f"{label:>26} {seconds / len(rows) * 1e3:>8.1f} ms/image {size:>8.0f} kB/image "
+              f"{baseline / seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
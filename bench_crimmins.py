@@ -0,0 +1,68 @@
+import argparse
+import time
+import numpy as np
+from crimmins import HAVE_NUMBA, crimmins_incremental, crimmins_speckle_removal, verify_equivalence
+
+def make_speckle_image(height, width, seed=0, fraction=1.0):
+    """Synthetic gradient image with multiplicative speckle noise on a fraction of the pixels."""
+    rng = np.random.default_rng(seed)
+    base = np.linspace(40, 215, width, dtype=np.float32)[None, :].repeat(height, axis=0)
+    speckle = rng.gamma(4.0, 0.25, size=(height, width)).astype(np.float32)
+    if fraction < 1.0:
+        speckle[rng.random((height, width)) >= fraction] = 1.0
+    noisy = base * speckle
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+def time_backend(img, backend, iterations, repeats):
+    """Best-of-N wall time in seconds for one backend."""
+    crimmins_speckle_removal(img, iterations, backend)  # Warm up (numba compiles here)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        crimmins_speckle_removal(img, iterations, backend)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Crimmins speckle removal backends.")
+    parser.add_argument("--sizes", nargs="+", default=["512x512", "1920x1080", "3840x2160"],
+                        help="Image sizes as WIDTHxHEIGHT")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--speckle-fraction", type=float, default=1.0,
+                        help="Fraction of noisy pixels; small values give mostly clean images")
+    parser.add_argument("--skip-reference", action="store_true",
+                        help="Do not time the original np.roll implementation")
+    args = parser.parse_args()
+
+    backends = ["numpy", "incremental"]
+    if HAVE_NUMBA:
+        backends.append("numba")
+    if not args.skip_reference:
+        backends.insert(0, "reference")
+
+    print(f"{'size':>12} {'backend':>11} {'time (s)':>10} {'ms/MP':>10} {'speedup':>8}")
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split("x"))
+        img = make_speckle_image(height, width, fraction=args.speckle_fraction)
+        megapixels = width * height / 1e6
+
+        checks = verify_equivalence(img[:256, :256], args.iterations)
+        if not all(checks.values()):
+            raise SystemExit(f"Backend output differs from reference: {checks}")
+
+        baseline = None
+        for backend in backends:
+            seconds = time_backend(img, backend, args.iterations, args.repeats)
+            baseline = baseline or seconds
+            print(f"{size:>12} {backend:>11} {seconds:>10.4f} {1000 * seconds / megapixels:>10.2f} "
+                  f"{baseline / seconds:>7.1f}x")
+
+        _, stats = crimmins_incremental(img, args.iterations)
+        full_work = 2 * args.iterations * width * height
+        print(f"{'':>12} incremental: {stats['iterations']} iterations, "
+              f"{100 * stats['pixels_touched'] / full_work:.1f}% of the full filter's pixel updates"
+              f"{', converged' if stats['converged'] else ''}")
+
+if __name__ == "__main__":
+    main()
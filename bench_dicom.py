@@ -0,0 +1,128 @@
+import argparse
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pydicom
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, MRImageStorage, generate_uid
+from dicom_volume import DicomVolume
+from slice_renderer import SliceRenderer
+
+def write_synthetic_dicom(path, frames=64, rows=512, columns=512, seed=0):
+    """Write a multi-frame 16-bit MR DICOM file filled with smooth noise."""
+    rng = np.random.default_rng(seed)
+    z, y, x = np.ogrid[:frames, :rows, :columns]
+    volume = (1000 + 800 * np.sin(x / 37.0) * np.cos(y / 53.0) * np.cos(z / 11.0)).astype(np.float32)
+    volume += rng.normal(0, 40, volume.shape).astype(np.float32)
+    pixels = np.clip(volume, 0, 4095).astype(np.uint16)
+
+    file_meta = FileMetaDataset()
+    file_meta.MediaStorageSOPClassUID = MRImageStorage
+    file_meta.MediaStorageSOPInstanceUID = generate_uid()
+    file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = FileDataset(path, {}, file_meta=file_meta, preamble=b"\0" * 128)
+    ds.SOPClassUID = MRImageStorage
+    ds.SOPInstanceUID = file_meta.MediaStorageSOPInstanceUID
+    ds.Modality = "MR"
+    ds.PatientID = "SYNTHETIC"
+    ds.StudyInstanceUID = generate_uid()
+    ds.SeriesInstanceUID = generate_uid()
+    ds.Rows, ds.Columns = rows, columns
+    ds.NumberOfFrames = frames
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 12
+    ds.HighBit = 11
+    ds.PixelRepresentation = 0
+    ds.PixelSpacing = [1.0, 1.0]
+    ds.SliceThickness = 1.0
+    ds.PixelData = pixels.tobytes()
+    ds.save_as(path, enforce_file_format=True)
+    return path
+
+def load_in_memory(path):
+    """The original task_3_mri.py loading path: full read, float copy, normalized copy."""
+    with open(path, "rb") as f:
+        dicom_data = pydicom.dcmread(io.BytesIO(f.read()))
+    image_data = dicom_data.pixel_array.astype(np.float32)
+    image_data = (image_data - np.min(image_data)) / (np.max(image_data) - np.min(image_data))
+    return image_data[0]
+
+def load_streaming(path, normalization):
+    return DicomVolume(path, normalization=normalization).frame(0)
+
+def measure(label, func, *args):
+    """Time-to-first-slice and peak traced allocation of one loader."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>18} {seconds * 1000:>12.1f} {peak / 2**20:>14.1f}")
+
+def scrub_order(num_frames, passes=4):
+    """Slice indices of a user dragging the slider back and forth."""
+    order = []
+    for p in range(passes):
+        sweep = range(num_frames) if p % 2 == 0 else range(num_frames - 1, -1, -1)
+        order.extend(sweep)
+    return order
+
+def scrub(path, use_renderer, delay):
+    """Frame latency percentiles (ms) for colormapped slices while scrubbing."""
+    from matplotlib import colormaps, colors
+
+    volume = DicomVolume(path)
+    if use_renderer:
+        renderer = SliceRenderer(volume)
+        get_frame = renderer.get
+    else:
+        # What matplotlib does on every draw: normalize and colormap the float slice
+        cmap = colormaps["inferno"]
+        first = volume.frame(0)
+        norm = colors.Normalize(float(first.min()), float(first.max()))
+        get_frame = lambda index: cmap(norm(volume.frame(index)), bytes=True)
+
+    latencies = []
+    for index in scrub_order(len(volume)):
+        start = time.perf_counter()
+        get_frame(index)
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(delay)  # Time between slider events
+    if use_renderer:
+        renderer.close()
+    return np.percentile(latencies, [50, 90, 99])
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare DICOM loaders on a synthetic multi-frame file.")
+    parser.add_argument("--path", help="Existing DICOM file to use instead of a synthetic one")
+    parser.add_argument("--frames", type=int, default=128)
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--scrub-delay", type=float, default=0.01,
+                        help="Seconds between simulated slider events")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path or write_synthetic_dicom(os.path.join(tmp, "synthetic.dcm"),
+                                                  args.frames, args.size, args.size)
+        print(f"File: {path} ({os.path.getsize(path) / 2**20:.1f} MB)")
+        if args.path is None:
+            assert isinstance(DicomVolume(path)._frames, np.memmap), "pixel data was read into memory"
+        print(f"{'loader':>18} {'first slice ms':>12} {'peak alloc MB':>14}")
+        measure("in-memory", load_in_memory, path)
+        measure("mmap + minmax", load_streaming, path, "minmax")
+        measure("mmap + sample", load_streaming, path, "sample")
+
+        print(f"\n{'scrubbing':>18} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+        for label, use_renderer in (("colormap per draw", False), ("LRU + prefetch", True)):
+            p50, p90, p99 = scrub(path, use_renderer, args.scrub_delay)
+            print(f"{label:>18} {p50:>8.2f} {p90:>8.2f} {p99:>8.2f}")
+
+if __name__ == "__main__":
+    main()
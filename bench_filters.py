@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from bench_crimmins import make_speckle_image
+import image_io
+import task_1_blurring
+import task_1_denoise
+import task_2_speckle
+
+# Filter name -> function of a uint8 grayscale image, with the parameters the scripts use
+FILTERS = {
+    "apply_closing": lambda img: task_1_blurring.apply_closing(img, 3),
+    "denoise_image": task_1_denoise.denoise_image,
+    "enhance_lines": task_1_denoise.enhance_lines,
+    "apply_median_filter": lambda img: task_2_speckle.apply_median_filter(img, task_2_speckle.MEDIAN_KERNEL_SIZE),
+    "apply_bilateral_filter": lambda img: task_2_speckle.apply_bilateral_filter(
+        img, task_2_speckle.BILATERAL_KERNEL_SIZE, task_2_speckle.BILATERAL_SIGMA_COLOR,
+        task_2_speckle.BILATERAL_SIGMA_SPACE),
+    "apply_crimmins_speckle_removal": lambda img: task_2_speckle.apply_crimmins_speckle_removal(
+        img, iterations=task_2_speckle.CRIMMINS_ITERATIONS),
+    "apply_my_method": lambda img: task_2_speckle.apply_my_method(
+        img, task_2_speckle.CRIMMINS_ITERATIONS, task_2_speckle.OPENING_KERNEL_SIZE,
+        task_2_speckle.CLOSING_KERNEL_SIZE),
+}
+
+SIZES = {"1080p": (1920, 1080), "4k": (3840, 2160), "8k": (7680, 4320)}
+REAL_FOLDERS = ["noisy/chemical", "noisy/speckle"]
+
+def load_cases(sizes, real=True, synthetic=True):
+    """(case name, image) pairs: real images at native size, upscaled real images and synthetic speckle."""
+    cases = []
+    for folder in REAL_FOLDERS if real else []:
+        images = image_io.load_images(folder, image_io.list_images(folder))
+        cases.extend((f"{folder}/{f}", img) for f, img in images)
+        first_name, first = images[0]
+        for size in sizes:
+            cases.append((f"{folder}/{first_name}@{size}", cv2.resize(first, SIZES[size],
+                                                                       interpolation=cv2.INTER_CUBIC)))
+    for size in sizes if synthetic else []:
+        width, height = SIZES[size]
+        cases.append((f"synthetic@{size}", make_speckle_image(height, width)))
+    return cases
+
+def max_rss_mb():
+    """Process high-water RSS in MB; covers native allocations tracemalloc cannot see."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_case(func, img, repeats):
+    """Best wall time over repeats plus the peak memory of one traced run."""
+    func(img)  # Warm up: compiled kernels, OpenCV thread pools
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(img)
+        best = min(best, time.perf_counter() - start)
+
+    rss_before = max_rss_mb()
+    tracemalloc.start()
+    func(img)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": best,
+        "megapixels_per_sec": img.size / 1e6 / best if best > 0 else float("inf"),
+        "peak_traced_mb": peak / 2**20,
+        "max_rss_growth_mb": max_rss_mb() - rss_before,
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run_suite(filters, cases, repeats):
+    results = []
+    for case, img in cases:
+        for name in filters:
+            record = {"filter": name, "case": case, "shape": list(img.shape)}
+            record.update(run_case(FILTERS[name], img, repeats))
+            results.append(record)
+            print(f"{name:>32} {case:>40} {record['seconds'] * 1000:>10.1f} ms "
+                  f"{record['megapixels_per_sec']:>8.2f} MP/s {record['peak_traced_mb']:>8.1f} MB")
+    return results
+
+def compare(old_path, new_path, threshold):
+    """Print cases whose time grew by more than threshold between two result files."""
+    with open(old_path) as f:
+        old = {(r["filter"], r["case"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    regressions = 0
+    for record in new:
+        before = old.get((record["filter"], record["case"]))
+        if before is None:
+            continue
+        ratio = record["seconds"] / before["seconds"]
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        regressions += bool(flag)
+        print(f"{record['filter']:>32} {record['case']:>40} {ratio:>6.2f}x {flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every filter of the task scripts.")
+    parser.add_argument("--filters", nargs="+", choices=sorted(FILTERS), default=list(FILTERS))
+    parser.add_argument("--sizes", nargs="*", choices=sorted(SIZES), default=list(SIZES))
+    parser.add_argument("--no-real", action="store_true", help="Skip images from noisy/")
+    parser.add_argument("--no-synthetic", action="store_true", help="Skip synthetic images")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Result file (default: bench_results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="Compare two result files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative slowdown reported as a regression by --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        raise SystemExit(1 if compare(*args.compare, args.threshold) else 0)
+
+    cases = load_cases(args.sizes, real=not args.no_real, synthetic=not args.no_synthetic)
+    commit = git_commit()
+    results = run_suite(args.filters, cases, args.repeats)
+
+    output = args.output or os.path.join("bench_results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": {"platform": platform.platform(), "cpus": os.cpu_count(),
+                        "opencv": cv2.__version__, "numpy": np.__version__},
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
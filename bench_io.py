@@ -0,0 +1,54 @@
+import argparse
+import os
+import tempfile
+import time
+import cv2
+import image_io
+from bench_crimmins import make_speckle_image
+
+def write_images(folder, count, width, height, extension):
+    """Synthetic speckle images encoded in the given format."""
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"{i:03d}.{extension}")
+        cv2.imwrite(path, make_speckle_image(height, width, seed=i))
+        paths.append(path)
+    return paths
+
+def run(images, compute):
+    """Seconds to push every image through compute."""
+    start = time.perf_counter()
+    for _, img in images:
+        compute(img)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode throughput of sequential, prefetched and cached image loading.")
+    parser.add_argument("--count", type=int, default=24)
+    parser.add_argument("--size", default="3840x2160", help="Image size as WIDTHxHEIGHT")
+    parser.add_argument("--format", choices=["png", "jpg"], default="png")
+    parser.add_argument("--workers", type=int, default=0, help="Decode threads (0 = all cores)")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+
+    def compute(img):
+        return cv2.medianBlur(img, 5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_images(tmp, args.count, width, height, args.format)
+        sequential = ((p, cv2.imread(p, cv2.IMREAD_GRAYSCALE)) for p in paths)
+        results = {"sequential imread": run(sequential, compute)}
+        results["prefetched"] = run(image_io.iter_images(paths, args.workers, cache=None), compute)
+
+        cache = image_io.DecodeCache(os.path.join(tmp, "decode_cache"))
+        results["cache cold"] = run(image_io.iter_images(paths, args.workers, cache=cache), compute)
+        results["cache warm"] = run(image_io.iter_images(paths, args.workers, cache=cache), compute)
+
+    baseline = results["sequential imread"]
+    print(f"{args.count} x {args.size} {args.format}, median filter as compute stage")
+    for name, seconds in results.items():
+        print(f"{name:>18} {seconds:>8.2f}s {args.count / seconds:>8.1f} images/sec {baseline / seconds:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import argparse
+import time
+import numpy as np
+import morphology
+from bench_crimmins import make_speckle_image
+
+def best_time(func, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify and time the morphology backends.")
+    parser.add_argument("--size", default="1920x1080", help="Image size as WIDTHxHEIGHT")
+    parser.add_argument("--kernels", type=int, nargs="+", default=[2, 3, 5, 9, 15, 31, 63, 127])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    img = make_speckle_image(height, width)
+
+    footprints = {f"square({k})": k for k in args.kernels}
+    footprints["disk(3)"] = morphology.disk(3)
+    checks = morphology.verify_against_skimage(img[:200, :200], footprints)
+    mismatches = [key for key, equal in checks.items() if not equal]
+    if mismatches:
+        raise SystemExit(f"Backends differ from skimage: {mismatches}")
+    print("All backends match skimage.morphology closing/opening.\n")
+
+    backends = ["skimage", "opencv", "vanherk"]
+    print(f"{'closing':>12} " + " ".join(f"{b + ' ms':>12}" for b in backends))
+    for k in args.kernels:
+        row = [best_time(lambda: morphology.closing(img, k, backend), args.repeats) * 1000
+               for backend in backends]
+        print(f"{f'square({k})':>12} " + " ".join(f"{ms:>12.1f}" for ms in row))
+
+if __name__ == "__main__":
+    main()
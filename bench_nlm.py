@@ -0,0 +1,40 @@
+import argparse
+import os
+import tempfile
+import time
+import image_io
+import nlm
+from metrics import psnr, ssim
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Speed/quality trade-off of the NLM modes and the result cache.")
+    parser.add_argument("--folders", nargs="+", default=["noisy/chemical", "noisy/speckle"])
+    args = parser.parse_args()
+
+    images = [img for folder in args.folders for _, img in image_io.load_images(folder, image_io.list_images(folder))]
+    exact, exact_time = timed(lambda: [nlm.denoise(img, cache=None) for img in images])
+
+    print(f"{'mode':>12} {'time (s)':>9} {'speedup':>8} {'PSNR dB':>8} {'SSIM':>6}")
+    print(f"{'exact':>12} {exact_time:>9.2f} {1.0:>7.1f}x {'-':>8} {'-':>6}")
+    for mode in ("reduced", "downsampled"):
+        results, seconds = timed(lambda: [nlm.denoise(img, mode=mode, cache=None) for img in images])
+        mean_psnr = sum(psnr(e, r) for e, r in zip(exact, results)) / len(images)
+        mean_ssim = sum(ssim(e, r) for e, r in zip(exact, results)) / len(images)
+        print(f"{mode:>12} {seconds:>9.2f} {exact_time / seconds:>7.1f}x {mean_psnr:>8.2f} {mean_ssim:>6.3f}")
+
+    _, batch_time = timed(nlm.denoise_batch, images, cache=None)
+    print(f"\nBatched exact ({os.cpu_count()} threads): {batch_time:.2f}s ({exact_time / batch_time:.1f}x)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = nlm.DenoiseCache(tmp)
+        _, cold = timed(lambda: [nlm.denoise(img, cache=cache) for img in images])
+        _, warm = timed(lambda: [nlm.denoise(img, cache=cache) for img in images])
+    print(f"Cache: cold {cold:.2f}s, warm {warm:.3f}s ({cold / warm:.0f}x)")
+
+if __name__ == "__main__":
+    main()
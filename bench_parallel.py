@@ -0,0 +1,37 @@
+import argparse
+import os
+import time
+from bench_crimmins import make_speckle_image
+from parallel import run_speckle_parallel
+import task_2_speckle
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure scaling of the parallel speckle pipeline.")
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--size", default="1024x1024", help="Image size as WIDTHxHEIGHT")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, 8, 16, 32, os.cpu_count()}))
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    images = [(i, make_speckle_image(height, width, seed=i)) for i in range(args.images)]
+
+    task_2_speckle.apply_speckle_filters(images[0][1])  # Warm up compiled kernels
+    start = time.perf_counter()
+    for _, img in images:
+        task_2_speckle.apply_speckle_filters(img)
+    serial = time.perf_counter() - start
+    print(f"{'workers':>8} {'time (s)':>10} {'images/s':>10} {'speedup':>8}")
+    print(f"{'serial':>8} {serial:>10.3f} {args.images / serial:>10.2f} {1.0:>7.2f}x")
+
+    for workers in args.workers:
+        if workers > os.cpu_count():
+            continue
+        start = time.perf_counter()
+        for _ in run_speckle_parallel(images, workers):
+            pass
+        seconds = time.perf_counter() - start
+        print(f"{workers:>8} {seconds:>10.3f} {args.images / seconds:>10.2f} {serial / seconds:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
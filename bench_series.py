@@ -0,0 +1,113 @@
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pydicom
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, MRImageStorage, generate_uid
+import dicom_series
+import parallel
+
+def write_synthetic_series(folder, slices=64, size=256, seed=0):
+    """One single-frame 16-bit MR file per slice, written in shuffled order under random names.
+
+    The file names and write order carry no information, so a loader has
+    to sort by ImagePositionPatient to get the slices right.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+    y, x = np.ogrid[:size, :size]
+    study_uid, series_uid = generate_uid(), generate_uid()
+    for index in rng.permutation(slices):
+        plane = 1000 + 800 * np.sin(x / 37.0) * np.cos(y / 53.0) * np.cos(index / 11.0)
+        plane = plane + rng.normal(0, 40, plane.shape)
+        pixels = np.clip(plane, 0, 4095).astype(np.uint16)
+
+        file_meta = FileMetaDataset()
+        file_meta.MediaStorageSOPClassUID = MRImageStorage
+        file_meta.MediaStorageSOPInstanceUID = generate_uid()
+        file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        path = os.path.join(folder, f"IM{rng.integers(1 << 30):010d}")
+        ds = FileDataset(path, {}, file_meta=file_meta, preamble=b"\0" * 128)
+        ds.SOPClassUID = MRImageStorage
+        ds.SOPInstanceUID = file_meta.MediaStorageSOPInstanceUID
+        ds.Modality = "MR"
+        ds.PatientID = "SYNTHETIC"
+        ds.StudyInstanceUID = study_uid
+        ds.SeriesInstanceUID = series_uid
+        ds.InstanceNumber = int(index) + 1
+        ds.ImagePositionPatient = [0.0, 0.0, 2.5 * float(index)]
+        ds.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+        ds.Rows, ds.Columns = size, size
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = "MONOCHROME2"
+        ds.BitsAllocated = 16
+        ds.BitsStored = 12
+        ds.HighBit = 11
+        ds.PixelRepresentation = 0
+        ds.PixelSpacing = [1.0, 1.0]
+        ds.SliceThickness = 2.5
+        ds.PixelData = pixels.tobytes()
+        ds.save_as(path, enforce_file_format=True)
+    return folder
+
+def load_naive(folder):
+    """Read every file in full, decode it and stack the slices sorted by InstanceNumber."""
+    datasets = [pydicom.dcmread(path) for path in dicom_series.find_dicom_files(folder)]
+    datasets.sort(key=lambda ds: int(ds.InstanceNumber))
+    return np.stack([ds.pixel_array for ds in datasets])
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Series load time, plane access and slice-parallel denoising.")
+    parser.add_argument("--series", help="Existing series folder instead of a synthetic one")
+    parser.add_argument("--slices", type=int, default=96)
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--filters", nargs="+", choices=dicom_series.DENOISERS,
+                        default=["median", "bilateral", "crimmins"])
+    parser.add_argument("--plane", choices=dicom_series.PLANES, default="axial")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.series or write_synthetic_series(os.path.join(tmp, "series"), args.slices, args.size)
+        cache = os.path.join(tmp, "cache")
+
+        naive, naive_seconds = timed(load_naive, folder)
+        series, cold = timed(dicom_series.DicomSeries, folder, cache_dir=cache)
+        warm_series, warm = timed(dicom_series.DicomSeries, folder, cache_dir=cache)
+        assert warm_series.cached and np.array_equal(naive, series.array), "slice order differs"
+        print(f"Series {folder}: {series.shape[0]} slices of {series.shape[2]}x{series.shape[1]}, "
+              f"spacing {series.spacing}")
+        print(f"{'load':>22} {'ms':>9}")
+        print(f"{'dcmread + stack':>22} {naive_seconds * 1e3:>9.1f}")
+        print(f"{'series, cold cache':>22} {cold * 1e3:>9.1f}")
+        print(f"{'series, cached .npy':>22} {warm * 1e3:>9.1f}")
+
+        print(f"\n{'plane':>22} {'slices':>7} {'ms/slice':>9}  (normalized float32 frame)")
+        for plane in dicom_series.PLANES:
+            view = series.plane(plane)
+            _, seconds = timed(lambda: [view.frame(i) for i in range(len(view))])
+            print(f"{plane:>22} {len(view):>7} {seconds / len(view) * 1e3:>9.3f}")
+
+        megapixels = series.array.size / 1e6
+        print(f"\n{'denoise (' + args.plane + ')':>22} {'workers':>7} {'s':>9} {'slices/s':>9} {'MP/s':>7}")
+        count = len(series.view(args.plane))
+        for workers in sorted(set(args.workers)):
+            # Started and warmed once, as a resident viewer or service would
+            with parallel.make_pool(workers) as pool:
+                dicom_series.denoise_volume(series, "median", os.path.join(tmp, "warm.npy"), args.plane,
+                                            chunk=1, pool=pool)
+                for name in args.filters:
+                    output = os.path.join(tmp, f"{name}.npy")
+                    _, seconds = timed(dicom_series.denoise_volume, series, name, output, args.plane, pool=pool)
+                    print(f"{name:>22} {workers:>7} {seconds:>9.2f} {count / seconds:>9.1f} "
+                          f"{megapixels / seconds:>7.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import os
+import http.client
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+import numpy as np
+import batch
+import image_io
+import service
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix socket."""
+
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.unix_path)
+
+def connect(url=None, unix_socket=None):
+    if unix_socket:
+        return UnixHTTPConnection(unix_socket, timeout=120)
+    parts = urlsplit(url)
+    return http.client.HTTPConnection(parts.hostname, parts.port, timeout=120)
+
+def run_load(connect_args, endpoint, bodies, concurrency, total, deadline_ms):
+    """Send total requests from concurrency client threads; returns (latencies, statuses, seconds)."""
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+    issued = iter(range(total))
+
+    def client():
+        conn = connect(*connect_args)
+        for i in issued:  # Shared iterator: each request index is sent once
+            body = bodies[i % len(bodies)]
+            start = time.perf_counter()
+            conn.request("POST", f"/{endpoint}?deadline_ms={deadline_ms}", body)
+            response = conn.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[response.status] += 1
+                if response.status == 200:
+                    latencies.append(elapsed)
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - start
+
+def one_shot_seconds(endpoint, path):
+    """Wall time of a fresh interpreter importing the pipeline and processing one image, like a script run."""
+    code = (f"import batch, image_io; "
+            f"batch.PIPELINES[{endpoint!r}](image_io.read_image({path!r}))")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for service.py: latency and throughput under concurrency.")
+    parser.add_argument("--url", help="Running service, e.g. http://127.0.0.1:8350 (default: start one in-process)")
+    parser.add_argument("--socket", help="Running service on a Unix socket")
+    parser.add_argument("--workers", type=int, default=0, help="Workers of the in-process service (0 = all cores)")
+    parser.add_argument("--max-pending", type=int, help="Queue bound of the in-process service")
+    parser.add_argument("--endpoint", choices=sorted(batch.PIPELINES), default="speckle")
+    parser.add_argument("--folder", default="noisy/speckle", help="Images sent as request bodies")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--deadline-ms", type=int, default=service.DEFAULT_DEADLINE_MS)
+    args = parser.parse_args()
+
+    files = image_io.list_images(args.folder)
+    bodies = []
+    for name in files:
+        with open(os.path.join(args.folder, name), "rb") as f:
+            bodies.append(f.read())
+
+    server = svc = None
+    if args.url or args.socket:
+        connect_args = (args.url, args.socket)
+    else:
+        svc = service.ProcessingService(args.workers or None, args.max_pending)
+        start = time.perf_counter()
+        svc.warm_up()
+        server = service.make_server(svc, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        connect_args = (f"http://127.0.0.1:{server.server_address[1]}", None)
+        print(f"Started {svc.workers} warm workers in {time.perf_counter() - start:.1f}s "
+              f"(queue bound {svc.max_pending})")
+
+    one_shot = one_shot_seconds(args.endpoint, os.path.join(args.folder, files[0]))
+    print(f"One-shot script run (fresh interpreter, 1 image): {one_shot * 1000:.0f} ms")
+    run_load(connect_args, args.endpoint, bodies, 1, len(bodies), args.deadline_ms)  # Warm caches and connections
+
+    print(f"{'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}  statuses")
+    try:
+        for concurrency in args.concurrency:
+            latencies, statuses, seconds = run_load(connect_args, args.endpoint, bodies, concurrency,
+                                                    args.requests, args.deadline_ms)
+            ms = np.array(latencies) * 1000 if latencies else np.array([np.nan])
+            codes = " ".join(f"{code}:{count}" for code, count in sorted(statuses.items()))
+            print(f"{concurrency:>7} {len(latencies) / seconds:>8.1f} {np.percentile(ms, 50):>8.1f} "
+                  f"{np.percentile(ms, 99):>8.1f}  {codes}")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            svc.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import itertools
+import time
+import cv2
+import numpy as np
+import image_io
+import stacks
+import task_1_blurring
+import task_2_speckle
+
+def per_image(images, crimmins_backend):
+    """The loop the scripts run today: one 2-D call per image and stage."""
+    outputs = []
+    for name, img in images:
+        img = task_1_blurring.preprocess_image(img)
+        crimmins = task_2_speckle.apply_crimmins_speckle_removal(img, 3, crimmins_backend)
+        mymethod = task_2_speckle.finish_my_method(crimmins, 3, 3)
+        outputs.append((name, task_2_speckle.calculate_difference_image(img, mymethod)))
+    return outputs
+
+def stacked(images, crimmins_backend):
+    """The same stages, one vectorized call per stack."""
+    outputs = []
+    for stack in stacks.bucket_images(images):
+        data = stacks.preprocess_stack(stack.data)
+        crimmins = stacks.crimmins_stack(data, 3, crimmins_backend)
+        mymethod = stacks.closing_stack(stacks.opening_stack(crimmins, 3), 3)
+        outputs.extend(stack.unstack(stacks.difference_stack(data, mymethod)))
+    return outputs
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-image loop vs vectorized (N, H, W) stacks on small images.")
+    parser.add_argument("--folder", default="noisy/chemical")
+    parser.add_argument("--count", type=int, default=240, help="Images to process (the folder is cycled)")
+    parser.add_argument("--size", help="Resize every image to WIDTHxHEIGHT, e.g. 64x64 for thumbnail-sized inputs")
+    args = parser.parse_args()
+
+    source = image_io.load_images(args.folder, image_io.list_images(args.folder))
+    if args.size:
+        size = tuple(int(v) for v in args.size.split("x"))
+        source = [(name, cv2.resize(img, size, interpolation=cv2.INTER_AREA)) for name, img in source]
+    images = [(f"{i}_{name}", img) for i, (name, img) in zip(range(args.count), itertools.cycle(source))]
+    shapes = {img.shape for _, img in images}
+    print(f"{len(images)} images, {len(shapes)} distinct shapes, pipeline: preprocess, Crimmins, "
+          f"opening + closing, difference image")
+
+    per_image(images[:2], "auto")  # Warm up (numba compiles here)
+    expected, baseline = timed(per_image, images, "numpy")
+    runs = [("per-image, numpy Crimmins", baseline)]
+    candidates = [
+        ("stacks, numpy Crimmins", stacked, (images, "numpy")),
+        ("per-image, auto Crimmins", per_image, (images, "auto")),
+        ("stacks, auto Crimmins", stacked, (images, "auto")),
+    ]
+    for label, func, func_args in candidates:
+        result, seconds = timed(func, *func_args)
+        same = all(np.array_equal(a, b) for (_, a), (_, b) in
+                   zip(sorted(expected, key=lambda r: r[0]), sorted(result, key=lambda r: r[0])))
+        if not same:
+            raise SystemExit(f"{label}: output differs from the per-image loop")
+        runs.append((label, seconds))
+
+    for label, seconds in runs:
+        print(f"{label:>32} {seconds:>8.2f}s {len(images) / seconds:>8.1f} images/sec {baseline / seconds:>6.2f}x")
+
+if __name__ == "__main__":
+    main()
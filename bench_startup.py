@@ -0,0 +1,85 @@
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import numpy as np
+
+MODULES = ["crimmins", "morphology", "nlm", "metrics", "composite", "dicom_volume",
+           "task_1_blurring", "task_1_denoise", "task_2_speckle", "task_3_mri", "batch", "service"]
+HEAVY = ["matplotlib", "skimage", "numba", "pydicom", "requests", "scipy"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def import_once(module, cwd, timeout=120):
+    """Import module in a fresh interpreter; returns (seconds, heavy modules it pulled in).
+
+    Seconds is nan when the import fails or times out, e.g. a module that
+    downloads data at import time without network access.
+    """
+    code = PROBE.format(module=module, heavy=HEAVY)
+    env = dict(os.environ, MPLBACKEND="Agg")
+    try:
+        out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, check=True,
+                             capture_output=True, text=True, timeout=timeout).stdout
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return float("nan"), ["import failed"]
+    result = json.loads(out.strip().splitlines()[-1])
+    return result["seconds"], result["loaded"]
+
+def measure(modules, cwd, repeats):
+    """Median cold import time and loaded heavy modules per module."""
+    results = {}
+    for module in modules:
+        runs = [import_once(module, cwd) for _ in range(repeats)]
+        results[module] = (float(np.median([seconds for seconds, _ in runs])), runs[-1][1])
+    return results
+
+def checkout(ref, folder):
+    """Extract the tracked files of a git ref into folder."""
+    archive = subprocess.run(["git", "archive", ref], check=True, capture_output=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(folder, filter="data")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import time of the pipeline modules in fresh interpreters.")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--compare", metavar="REF", help="Also measure this git ref, e.g. HEAD~1")
+    args = parser.parse_args()
+
+    current = measure(args.modules, os.getcwd(), args.repeats)
+    baseline = None
+    if args.compare:
+        with tempfile.TemporaryDirectory() as tmp:
+            checkout(args.compare, tmp)
+            modules = [m for m in args.modules if os.path.exists(os.path.join(tmp, f"{m}.py"))]
+            baseline = measure(modules, tmp, args.repeats)
+
+    header = f"{'module':>16} {'import ms':>10}"
+    if baseline:
+        header += f" {args.compare + ' ms':>12} {'speedup':>8}"
+    print(header + "  heavy modules loaded")
+    for module, (seconds, loaded) in current.items():
+        line = f"{module:>16} {seconds * 1e3:>10.0f}"
+        if baseline and module in baseline:
+            before, before_loaded = baseline[module]
+            line += f" {before * 1e3:>12.0f} {before / seconds:>7.1f}x"
+            loaded = f"{', '.join(loaded) or '-'} (was {', '.join(before_loaded) or '-'})"
+        else:
+            loaded = ", ".join(loaded) or "-"
+            if baseline:
+                line += f" {'-':>12} {'-':>8}"
+        print(f"{line}  {loaded}")
+
+if __name__ == "__main__":
+    main()
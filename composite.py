@@ -0,0 +1,194 @@
+import os
+import queue
+import threading
+import cv2
+import numpy as np
+import profiling
+
+# Layout of the cv2 mosaic, in pixels
+LABEL_HEIGHT = 24
+TITLE_HEIGHT = 32
+GAP = 4
+BACKGROUND = 255
+TEXT_COLOR = 0
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# OpenCV's PNG default is 3; level 1 trades slightly larger files for faster encoding
+DEFAULT_PNG_COMPRESSION = 1
+DEFAULT_JPEG_QUALITY = 90
+
+# Composites queued for the writer thread before submit() blocks
+DEFAULT_MAX_PENDING = 8
+
+def _to_uint8(img):
+    if img.dtype == np.uint8:
+        return img
+    return cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+
+def _put_text(canvas, text, left, top, width, height, scale):
+    """Draw text centred in the box, shrunk until it fits the width."""
+    (text_width, text_height), baseline = cv2.getTextSize(text, FONT, scale, 1)
+    if text_width > width - 4:
+        scale *= (width - 4) / text_width
+        (text_width, text_height), baseline = cv2.getTextSize(text, FONT, scale, 1)
+    x = left + (width - text_width) // 2
+    y = top + (height + text_height) // 2
+    cv2.putText(canvas, text, (x, y), FONT, scale, TEXT_COLOR, 1, cv2.LINE_AA)
+
+def mosaic(rows, title=None):
+    """Tile rows of (label, image) pairs into one labelled uint8 image, without matplotlib.
+
+    Every cell is as large as the largest image; smaller images are centred.
+    Images are drawn with their raw grey values (non-uint8 arrays are
+    min-max scaled), and rows may have different lengths.
+    """
+    rows = [[(label, _to_uint8(img)) for label, img in row] for row in rows]
+    cells = [img for row in rows for _, img in row]
+    cell_height = max(img.shape[0] for img in cells)
+    cell_width = max(img.shape[1] for img in cells)
+    columns = max(len(row) for row in rows)
+    top = TITLE_HEIGHT if title else 0
+    row_height = LABEL_HEIGHT + cell_height + GAP
+    canvas = np.full((top + len(rows) * row_height + GAP, columns * (cell_width + GAP) + GAP),
+                     BACKGROUND, np.uint8)
+    if title:
+        _put_text(canvas, title, 0, 0, canvas.shape[1], TITLE_HEIGHT, 0.7)
+    for r, row in enumerate(rows):
+        y = top + r * row_height
+        for c, (label, img) in enumerate(row):
+            x = GAP + c * (cell_width + GAP)
+            _put_text(canvas, label, x, y, cell_width, LABEL_HEIGHT, 0.5)
+            dy = y + LABEL_HEIGHT + (cell_height - img.shape[0]) // 2
+            dx = x + (cell_width - img.shape[1]) // 2
+            canvas[dy:dy + img.shape[0], dx:dx + img.shape[1]] = img
+    return canvas
+
+def encode_params(path, png_compression=DEFAULT_PNG_COMPRESSION, jpeg_quality=DEFAULT_JPEG_QUALITY):
+    """cv2.imwrite parameters for the format given by the file extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    if ext in (".jpg", ".jpeg"):
+        return [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+    return []
+
+def write_image(path, img, png_compression=DEFAULT_PNG_COMPRESSION, jpeg_quality=DEFAULT_JPEG_QUALITY):
+    """Encode img to path, raising OSError when OpenCV cannot write it."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if not cv2.imwrite(path, img, encode_params(path, png_compression, jpeg_quality)):
+        raise OSError(f"Could not write {path}")
+    return path
+
+def write_mosaic(path, rows, title=None, png_compression=DEFAULT_PNG_COMPRESSION,
+                 jpeg_quality=DEFAULT_JPEG_QUALITY, image=None):
+    """Build the mosaic of rows and write it to path."""
+    with profiling.stage("composite", image=image):
+        return write_image(path, mosaic(rows, title), png_compression, jpeg_quality)
+
+def figure(rows, title=None, figsize=None, fontsize=10):
+    """The same layout as a matplotlib figure: the slower, high-fidelity mode."""
+    import matplotlib.pyplot as plt
+    columns = max(len(row) for row in rows)
+    fig, axes = plt.subplots(len(rows), columns, figsize=figsize or (4 * columns, 4 * len(rows)), squeeze=False)
+    for ax_row, row in zip(axes, rows):
+        for ax in ax_row:
+            ax.axis("off")
+        for ax, (label, img) in zip(ax_row, row):
+            ax.imshow(img, cmap='gray')
+            ax.set_title(label, fontsize=fontsize)
+    if title:
+        plt.suptitle(title, fontsize=fontsize + 2)
+    plt.tight_layout()
+    return fig
+
+def save_figure(path, rows, title=None, figsize=None, image=None):
+    """Render rows with matplotlib and save the figure to path."""
+    import matplotlib.pyplot as plt
+    with profiling.stage("figure_render", image=image):
+        fig = figure(rows, title, figsize)
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with profiling.stage("savefig", image=image):
+            fig.savefig(path)
+    finally:
+        plt.close(fig)
+    return path
+
+class CompositeWriter:
+    """Builds and encodes mosaics on a background thread.
+
+    submit() only queues the arrays, so the caller can go on filtering the
+    next image; it blocks once max_pending composites are waiting, which
+    bounds memory. The first write error is raised from the next submit()
+    or from close(). The queued arrays must not be modified afterwards.
+    """
+
+    def __init__(self, png_compression=DEFAULT_PNG_COMPRESSION, jpeg_quality=DEFAULT_JPEG_QUALITY,
+                 max_pending=DEFAULT_MAX_PENDING):
+        self.png_compression = png_compression
+        self.jpeg_quality = jpeg_quality
+        self.written = []
+        self._error = None
+        self._queue = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._run, name="composite-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, rows, title, image = item
+            if self._error is not None:
+                continue
+            try:
+                write_mosaic(path, rows, title, self.png_compression, self.jpeg_quality, image or path)
+                self.written.append(path)
+            except Exception as exc:
+                self._error = exc
+
+    def _raise(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def submit(self, path, rows, title=None, image=None):
+        """Queue one mosaic for writing; image labels its profiling stages."""
+        self._raise()
+        self._queue.put((path, rows, title, image))
+
+    def close(self):
+        """Wait for every queued composite to be written."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class FigureWriter:
+    """CompositeWriter interface for the matplotlib mode.
+
+    pyplot is not thread-safe, so figures are rendered and saved on the
+    calling thread as they are submitted.
+    """
+
+    def __init__(self, figsize=None):
+        self.figsize = figsize
+        self.written = []
+
+    def submit(self, path, rows, title=None, image=None):
+        self.written.append(save_figure(path, rows, title, self.figsize, image or path))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
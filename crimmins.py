@@ -0,0 +1,323 @@
+import importlib.util
+import threading
+import numpy as np
+import profiling
+
+# Optional compiled backend, imported on first use (see crimmins_numba.py)
+HAVE_NUMBA = importlib.util.find_spec("numba") is not None
+
+# Border values that can never satisfy the strict Crimmins comparisons, so
+# pixels on the image edge are left untouched in the directions that would
+# need a neighbor outside the image (same behavior as the np.roll version).
+DARK_BORDER = -1
+LIGHT_BORDER = 256
+
+DEFAULT_TILE_ROWS = 64
+
+# crimmins_incremental switches from the full-image kernel to gathering the
+# active pixels once the active region is below this fraction of the image
+SPARSE_FRACTION = 0.25
+
+
+def crimmins_reference(img, iterations=3):
+    """Original np.roll based Crimmins implementation, kept for equivalence checks."""
+
+    def adjust_dark_pixels(img):
+        """Adjusts dark pixels based on neighboring pixels."""
+        a = img.astype(np.int16)
+        b = a.copy()
+        height, width = img.shape[:2]  # Handle grayscale images
+
+        # N-S direction
+        c = np.roll(a, -1, axis=0)
+        c[0, :] = a[0, :]  # Handle top boundary
+        d = np.roll(a, 1, axis=0)
+        d[height - 1, :] = a[height - 1, :]  # Handle bottom boundary
+        mask = (a < np.minimum(c, d)) & (c != d)
+        b[mask] += np.sign(c[mask] - d[mask])
+
+        # E-W direction
+        c = np.roll(a, -1, axis=1)
+        c[:, 0] = a[:, 0]  # Handle left boundary
+        d = np.roll(a, 1, axis=1)
+        d[:, width - 1] = a[:, width - 1]  # Handle right boundary
+        mask = (a < np.minimum(c, d)) & (c != d)
+        b[mask] += np.sign(c[mask] - d[mask])
+
+        # NW-SE direction
+        c = np.roll(np.roll(a, -1, axis=0), -1, axis=1)
+        c[0, :] = a[0, :]
+        c[:, 0] = a[:, 0]
+        d = np.roll(np.roll(a, 1, axis=0), 1, axis=1)
+        d[height - 1, :] = a[height - 1, :]
+        d[:, width - 1] = a[:, width - 1]
+        mask = (a < np.minimum(c, d)) & (c != d)
+        b[mask] += np.sign(c[mask] - d[mask])
+
+        # NE-SW direction
+        c = np.roll(np.roll(a, -1, axis=0), 1, axis=1)
+        c[0, :] = a[0, :]
+        c[:, width - 1] = a[:, width - 1]
+        d = np.roll(np.roll(a, 1, axis=0), -1, axis=1)
+        d[height - 1, :] = a[height - 1, :]
+        d[:, 0] = a[:, 0]
+        mask = (a < np.minimum(c, d)) & (c != d)
+        b[mask] += np.sign(c[mask] - d[mask])
+
+        return b.astype(np.uint8)
+
+    def adjust_light_pixels(img):
+        """Adjusts light pixels based on neighboring pixels."""
+        a = img.astype(np.int16)
+        b = a.copy()
+        height, width = img.shape[:2]
+
+        # N-S direction
+        c = np.roll(a, -1, axis=0)
+        c[0, :] = a[0, :]
+        d = np.roll(a, 1, axis=0)
+        d[height - 1, :] = a[height - 1, :]
+        mask = (a > np.maximum(c, d)) & (c != d)
+        b[mask] -= np.sign(c[mask] - d[mask])
+
+        # E-W direction
+        c = np.roll(a, -1, axis=1)
+        c[:, 0] = a[:, 0]
+        d = np.roll(a, 1, axis=1)
+        d[:, width - 1] = a[:, width - 1]
+        mask = (a > np.maximum(c, d)) & (c != d)
+        b[mask] -= np.sign(c[mask] - d[mask])
+
+        # NW-SE direction
+        c = np.roll(np.roll(a, -1, axis=0), -1, axis=1)
+        c[0, :] = a[0, :]
+        c[:, 0] = a[:, 0]
+        d = np.roll(np.roll(a, 1, axis=0), 1, axis=1)
+        d[height - 1, :] = a[height - 1, :]
+        d[:, width - 1] = a[:, width - 1]
+        mask = (a > np.maximum(c, d)) & (c != d)
+        b[mask] -= np.sign(c[mask] - d[mask])
+
+        # NE-SW direction
+        c = np.roll(np.roll(a, -1, axis=0), 1, axis=1)
+        c[0, :] = a[0, :]
+        c[:, width - 1] = a[:, width - 1]
+        d = np.roll(np.roll(a, 1, axis=0), -1, axis=1)
+        d[height - 1, :] = a[height - 1, :]
+        d[:, 0] = a[:, 0]
+        mask = (a > np.maximum(c, d)) & (c != d)
+        b[mask] -= np.sign(c[mask] - d[mask])
+
+        return b.astype(np.uint8)
+
+    img_adjusted = img.copy()
+    for _ in range(iterations):
+        img_adjusted = adjust_dark_pixels(img_adjusted)
+        img_adjusted = adjust_light_pixels(img_adjusted)
+    return img_adjusted
+
+
+class CrimminsWorkspace:
+    """Preallocated buffers for the fused NumPy Crimmins kernel.
+
+    The image lives in the interior of a padded int16 buffer, so every
+    neighbor is a slice view of that buffer instead of an np.roll copy.
+    A workspace can be reused for any number of images of the same shape,
+    and a (N, H, W) shape filters a whole stack of images in one pass.
+    """
+
+    def __init__(self, shape):
+        *stack, height, width = shape
+        self.shape = tuple(shape)
+        self.padded = np.empty((*stack, height + 2, width + 2), np.int16)
+        self.center = self.padded[..., 1:-1, 1:-1]
+        self.acc = np.empty(self.shape, np.int16)
+        self.extreme = np.empty(self.shape, np.int16)
+        self.step = np.empty(self.shape, np.int16)
+        self.mask = np.empty(self.shape, np.bool_)
+
+        p = self.padded
+        # (c, d) neighbor pairs for the N-S, E-W, NW-SE and NE-SW directions
+        self.directions = [
+            (p[..., 2:, 1:-1], p[..., :-2, 1:-1]),
+            (p[..., 1:-1, 2:], p[..., 1:-1, :-2]),
+            (p[..., 2:, 2:], p[..., :-2, :-2]),
+            (p[..., 2:, :-2], p[..., :-2, 2:]),
+        ]
+
+    def set_border(self, value):
+        """Fill the one pixel frame around the image with a constant."""
+        self.padded[..., 0, :] = value
+        self.padded[..., -1, :] = value
+        self.padded[..., :, 0] = value
+        self.padded[..., :, -1] = value
+
+    def adjust(self, dark):
+        """Run one dark or light pass in place on the padded buffer."""
+        a = self.center
+        acc, extreme, step, mask = self.acc, self.extreme, self.step, self.mask
+
+        with profiling.stage("crimmins_dark" if dark else "crimmins_light"):
+            self.set_border(DARK_BORDER if dark else LIGHT_BORDER)
+            np.copyto(acc, a)
+            for c, d in self.directions:
+                if dark:
+                    np.minimum(c, d, out=extreme)
+                    np.less(a, extreme, out=mask)
+                else:
+                    np.maximum(c, d, out=extreme)
+                    np.greater(a, extreme, out=mask)
+                np.subtract(c, d, out=step)
+                np.sign(step, out=step)
+                if dark:
+                    np.add(acc, step, out=acc, where=mask)
+                else:
+                    np.subtract(acc, step, out=acc, where=mask)
+            # Same wrap-around as the int16 -> uint8 cast of the reference version
+            np.bitwise_and(acc, 0xFF, out=a)
+
+    def run(self, img, iterations, out=None):
+        """Filter img for the given number of iterations."""
+        np.copyto(self.center, img)
+        for _ in range(iterations):
+            self.adjust(dark=True)
+            self.adjust(dark=False)
+        if out is None:
+            out = np.empty(self.shape, np.uint8)
+        np.copyto(out, self.center, casting='unsafe')
+        return out
+
+
+def _sparse_pass(flat, idx, dark, directions):
+    """Dark or light pass result for the padded flat positions idx only."""
+    a = flat[idx]
+    acc = a.copy()
+    for c_off, d_off in directions:
+        c = flat[idx + c_off]
+        d = flat[idx + d_off]
+        if dark:
+            mask = a < np.minimum(c, d)
+            acc[mask] += np.sign(c[mask] - d[mask])
+        else:
+            mask = a > np.maximum(c, d)
+            acc[mask] -= np.sign(c[mask] - d[mask])
+    return acc & 0xFF
+
+
+def crimmins_incremental(img, iterations=3, change_threshold=0.0):
+    """Crimmins filter that only recomputes pixels whose neighborhood changed.
+
+    A pass can only change a pixel if the pixel or one of its 8 neighbors
+    changed since the previous pass of the same kind, so each pass works on
+    that active region instead of the full image (passes with a large active
+    region still use the full-image kernel). Iteration stops early once
+    the image stops changing (same output as the full filter), or once an
+    iteration changes at most change_threshold of the pixels (approximate),
+    so iterations is an upper bound.
+
+    Returns (result, stats) where stats holds the iterations run, the
+    pixels touched over all passes and whether the image converged.
+    """
+    height, width = img.shape[:2]
+    workspace = CrimminsWorkspace((height, width))
+    np.copyto(workspace.center, img)
+    flat = workspace.padded.ravel()
+    row = width + 2
+    # Same (c, d) neighbor pairs as CrimminsWorkspace, as flat offsets
+    directions = np.array([(row, -row), (1, -1), (row + 1, -row - 1), (row - 1, -row + 1)])
+    window = [dr * row + dc for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
+
+    before = np.empty((height, width), np.int16)
+    diff = np.empty((height, width), np.bool_)
+    active = np.zeros(workspace.padded.shape, np.bool_)
+    active_flat = active.ravel()
+    moved = {True: None, False: None}  # Pixels each pass changed last time; None = unknown or too many
+    stats = {"iterations": 0, "pixels_touched": 0, "converged": False}
+
+    while stats["iterations"] < iterations:
+        changed_in_iteration = 0
+        for dark in (True, False):
+            idx = None
+            if moved[True] is not None and moved[False] is not None:
+                changed = np.concatenate((moved[True], moved[False]))
+                if len(changed) * len(window) < SPARSE_FRACTION * height * width:
+                    for offset in window:
+                        active_flat[changed + offset] = True
+                    active[0, :] = active[-1, :] = active[:, 0] = active[:, -1] = False
+                    idx = np.flatnonzero(active_flat)
+                    active_flat[idx] = False
+
+            if idx is None:  # Active region too large to be worth gathering
+                np.copyto(before, workspace.center)
+                workspace.adjust(dark)
+                np.not_equal(before, workspace.center, out=diff)
+                count = np.count_nonzero(diff)
+                moved[dark] = None  # Too many changes for the next pass to be sparse
+                if count * len(window) < SPARSE_FRACTION * height * width:
+                    rows, cols = np.nonzero(diff)
+                    moved[dark] = (rows + 1) * row + cols + 1
+                stats["pixels_touched"] += height * width
+                changed_in_iteration += count
+            else:
+                workspace.set_border(DARK_BORDER if dark else LIGHT_BORDER)
+                if HAVE_NUMBA:
+                    import crimmins_numba
+                    values = crimmins_numba.sparse_pass(flat, idx, dark, directions)
+                else:
+                    values = _sparse_pass(flat, idx, dark, directions)
+                update = values != flat[idx]
+                moved[dark] = idx[update]
+                flat[moved[dark]] = values[update]
+                stats["pixels_touched"] += len(idx)
+                changed_in_iteration += len(moved[dark])
+
+        stats["iterations"] += 1
+        if changed_in_iteration == 0:
+            stats["converged"] = True
+            break
+        if changed_in_iteration <= change_threshold * height * width:
+            break
+
+    return workspace.center.astype(np.uint8), stats
+
+
+def crimmins_speckle_removal(img, iterations=3, backend="auto", tile_rows=DEFAULT_TILE_ROWS,
+                             workspace=None):
+    """Crimmins speckle removal on a 2-D uint8 image (or a (N, H, W) stack with the numpy backend).
+
+    backend is "numpy" (fused slice-view kernel), "numba" (compiled, tiled
+    kernel), "incremental" (active-region kernel, see crimmins_incremental),
+    "reference" (original np.roll version) or "auto", which picks numba when
+    it is installed. All backends give bit-identical output.
+    """
+    if backend == "auto":
+        backend = "numba" if HAVE_NUMBA else "numpy"
+
+    if backend == "reference":
+        return crimmins_reference(img, iterations)
+    if backend == "incremental":
+        return crimmins_incremental(img, iterations)[0]
+    if backend == "numba":
+        if not HAVE_NUMBA:
+            raise ImportError("The numba backend requires numba to be installed.")
+        import crimmins_numba
+        kernel = crimmins_numba.crimmins_parallel
+        if threading.current_thread() is not threading.main_thread():
+            kernel = crimmins_numba.crimmins_serial
+        return kernel(np.ascontiguousarray(img, dtype=np.uint8), iterations, tile_rows)
+    if backend == "numpy":
+        if workspace is None or workspace.shape != img.shape:
+            workspace = CrimminsWorkspace(img.shape)
+        return workspace.run(img, iterations)
+    raise ValueError(f"Unknown Crimmins backend: {backend}")
+
+
+def verify_equivalence(img, iterations=3, backends=("numpy", "numba", "incremental")):
+    """Check that each available backend matches the reference output exactly."""
+    expected = crimmins_reference(img, iterations)
+    results = {}
+    for backend in backends:
+        if backend == "numba" and not HAVE_NUMBA:
+            continue
+        results[backend] = bool(np.array_equal(crimmins_speckle_removal(img, iterations, backend), expected))
+    return results
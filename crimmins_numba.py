@@ -0,0 +1,95 @@
+import numpy as np
+from numba import njit, prange
+
+# Compiled Crimmins kernels. Importing numba takes most of a second, so
+# crimmins.py only imports this module the first time a numba kernel runs.
+
+@njit(cache=True, nogil=True)
+def _crimmins_rows(src, dst, dark, row_start, row_stop):
+    """Single dark or light pass over rows [row_start, row_stop)."""
+    height, width = src.shape
+    for i in range(row_start, row_stop):
+        vertical = 0 < i < height - 1
+        for j in range(width):
+            horizontal = 0 < j < width - 1
+            a = np.int16(src[i, j])
+            total = a
+            for k in range(4):
+                if k == 0:
+                    if not vertical:
+                        continue
+                    c = np.int16(src[i + 1, j])
+                    d = np.int16(src[i - 1, j])
+                elif k == 1:
+                    if not horizontal:
+                        continue
+                    c = np.int16(src[i, j + 1])
+                    d = np.int16(src[i, j - 1])
+                elif k == 2:
+                    if not (vertical and horizontal):
+                        continue
+                    c = np.int16(src[i + 1, j + 1])
+                    d = np.int16(src[i - 1, j - 1])
+                else:
+                    if not (vertical and horizontal):
+                        continue
+                    c = np.int16(src[i + 1, j - 1])
+                    d = np.int16(src[i - 1, j + 1])
+                if c == d:
+                    continue
+                sign = 1 if c > d else -1
+                if dark:
+                    if a < min(c, d):
+                        total += sign
+                else:
+                    if a > max(c, d):
+                        total -= sign
+            dst[i, j] = np.uint8(total & 0xFF)
+
+def _crimmins_tiled(img, iterations, tile_rows):
+    """Tiled Crimmins kernel; row tiles of each pass run in parallel."""
+    height = img.shape[0]
+    src = img.copy()
+    dst = np.empty_like(img)
+    n_tiles = (height + tile_rows - 1) // tile_rows
+    for _ in range(iterations):
+        for dark in (True, False):
+            for t in prange(n_tiles):
+                start = t * tile_rows
+                _crimmins_rows(src, dst, dark, start, min(start + tile_rows, height))
+            src, dst = dst, src
+    return src
+
+@njit(cache=True, nogil=True)
+def sparse_pass(flat, idx, dark, directions):
+    """Compiled version of crimmins._sparse_pass."""
+    values = np.empty(len(idx), np.int16)
+    for n in range(len(idx)):
+        p = idx[n]
+        a = flat[p]
+        total = a
+        for k in range(4):
+            c = flat[p + directions[k, 0]]
+            d = flat[p + directions[k, 1]]
+            if dark:
+                if a < min(c, d):
+                    total += np.sign(c - d)
+            else:
+                if a > max(c, d):
+                    total -= np.sign(c - d)
+        values[n] = total & 0xFF
+    return values
+
+crimmins_parallel = njit(cache=True, parallel=True)(_crimmins_tiled)
+
+# numba's default threading layer must not be entered from several Python
+# threads, so calls from worker threads use a serial build that drops the GIL.
+# The on-disk cache is indexed by the Python function, so a second cached
+# dispatcher of _crimmins_tiled would load whichever build was compiled
+# first; the serial build is cached through its own wrapper instead.
+_crimmins_tiled_serial = njit(nogil=True)(_crimmins_tiled)
+
+@njit(cache=True, nogil=True)
+def crimmins_serial(img, iterations, tile_rows):
+    """_crimmins_tiled compiled without parallel=True (prange runs as range)."""
+    return _crimmins_tiled_serial(img, iterations, tile_rows)
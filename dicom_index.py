@@ -0,0 +1,214 @@
+import argparse
+import os
+import sqlite3
+import time
+from dicom_series import _position_along_normal, find_dicom_files
+
+INDEX_PATH = "dicom_cache/index.sqlite"
+# Header files handed to a worker per task
+READ_CHUNK = 64
+
+# Column -> (DICOM keyword, SQLite type), copied straight from the header
+HEADER_COLUMNS = {
+    "patient_id": ("PatientID", "TEXT"),
+    "study_uid": ("StudyInstanceUID", "TEXT"),
+    "series_uid": ("SeriesInstanceUID", "TEXT"),
+    "sop_uid": ("SOPInstanceUID", "TEXT"),
+    "modality": ("Modality", "TEXT"),
+    "study_date": ("StudyDate", "TEXT"),
+    "series_description": ("SeriesDescription", "TEXT"),
+    "instance_number": ("InstanceNumber", "INTEGER"),
+    "height": ("Rows", "INTEGER"),
+    "width": ("Columns", "INTEGER"),
+    "frames": ("NumberOfFrames", "INTEGER"),
+    "slice_thickness": ("SliceThickness", "REAL"),
+}
+# Derived from the header: PixelSpacing split in two, and the position along the slice normal
+DERIVED_COLUMNS = {"row_spacing": "REAL", "column_spacing": "REAL", "slice_position": "REAL"}
+COLUMNS = list(HEADER_COLUMNS) + list(DERIVED_COLUMNS)
+
+# Value representations whose raw bytes are plain ASCII, whatever the character set
+ASCII_VRS = {"AS", "CS", "DA", "DS", "DT", "IS", "TM", "UI"}
+
+def _value(value, kind):
+    if value is None or value == "":
+        return None
+    if kind == "INTEGER":
+        return int(value)
+    if kind == "REAL":
+        return float(value)
+    return str(value)
+
+def _element(ds, keyword):
+    """Value of one header element, or None.
+
+    pydicom's value conversion costs more than parsing the whole header, so
+    ASCII and unsigned short elements are decoded from the raw bytes; text
+    that depends on the character set (names, descriptions) goes through
+    pydicom as usual. Multiple values come back as a list of strings.
+    """
+    from pydicom.datadict import dictionary_VR, tag_for_keyword
+    from pydicom.dataelem import RawDataElement
+
+    tag = tag_for_keyword(keyword)
+    element = ds.get_item(tag)
+    if element is None or not element.value:
+        return None
+    if isinstance(element, RawDataElement):
+        vr = dictionary_VR(tag)
+        if vr in ASCII_VRS:
+            values = element.value.decode("ascii", "replace").strip(" \0").split("\\")
+            return values if len(values) > 1 else values[0]
+        if vr == "US" and len(element.value) == 2:
+            return int.from_bytes(element.value, "little" if ds.is_little_endian else "big")
+    return getattr(ds, keyword, None)
+
+def read_header(path):
+    """(path, size, mtime_ns, column values) of one file, reading no pixel data.
+
+    The values are None when the file is not DICOM, so it is still recorded
+    and not opened again until it changes.
+    """
+    import pydicom
+    from pydicom.errors import InvalidDicomError
+
+    stat = os.stat(path)
+    try:
+        ds = pydicom.dcmread(path, stop_before_pixels=True)
+    except (InvalidDicomError, OSError):
+        return path, stat.st_size, stat.st_mtime_ns, None
+    values = [_value(_element(ds, keyword), kind) for keyword, kind in HEADER_COLUMNS.values()]
+    spacing = _element(ds, "PixelSpacing") or (None, None)
+    values += [_value(spacing[0], "REAL"), _value(spacing[1], "REAL"),
+               _position_along_normal(_element(ds, "ImageOrientationPatient"),
+                                      _element(ds, "ImagePositionPatient"))]
+    return path, stat.st_size, stat.st_mtime_ns, values
+
+def read_headers(paths, workers=None):
+    """read_header over many files, spread over worker processes (header parsing is pure Python)."""
+    workers = workers or os.cpu_count()
+    if workers == 1 or len(paths) < 2 * READ_CHUNK:
+        return [read_header(path) for path in paths]
+    from parallel import make_pool
+    # Header parsing runs no OpenCV/numba code, so the workers need no thread limits
+    with make_pool(workers, initializer=None) as pool:
+        return list(pool.map(read_header, paths, chunksize=READ_CHUNK))
+
+class DicomIndex:
+    """SQLite catalogue of DICOM headers, one row per file.
+
+    scan() only re-reads files whose size or mtime changed since the last
+    scan and drops rows of files that disappeared, so rescanning a large,
+    mostly unchanged archive costs little more than walking it.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        columns = [f"{name} {kind}" for name, (_, kind) in HEADER_COLUMNS.items()]
+        columns += [f"{name} {kind}" for name, kind in DERIVED_COLUMNS.items()]
+        with self.db:
+            self.db.execute(f"CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, "
+                            f"mtime_ns INTEGER, dicom INTEGER, {', '.join(columns)})")
+            for column in ("patient_id", "study_uid", "series_uid"):
+                self.db.execute(f"CREATE INDEX IF NOT EXISTS files_{column} ON files ({column})")
+
+    def scan(self, folder, workers=None):
+        """Bring the rows for every file below folder up to date; returns counts per outcome."""
+        folder = os.path.abspath(folder)
+        prefix = folder.rstrip(os.sep) + os.sep
+        known = {row["path"]: (row["size"], row["mtime_ns"]) for row in self.db.execute(
+            "SELECT path, size, mtime_ns FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))}
+
+        changed, seen = [], set()
+        for path in find_dicom_files(folder):
+            seen.add(path)
+            stat = os.stat(path)
+            if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                changed.append(path)
+        removed = [path for path in known if path not in seen]
+
+        rows = []
+        for path, size, mtime_ns, values in read_headers(changed, workers):
+            rows.append([path, size, mtime_ns, values is not None] + (values or [None] * len(COLUMNS)))
+        placeholders = ", ".join("?" * (4 + len(COLUMNS)))
+        with self.db:
+            self.db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+            self.db.executemany(f"INSERT OR REPLACE INTO files VALUES ({placeholders})", rows)
+        return {"files": len(seen), "read": len(changed), "unchanged": len(seen) - len(changed),
+                "removed": len(removed)}
+
+    def _where(self, filters):
+        unknown = set(filters) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns {sorted(unknown)}, expected some of {COLUMNS}")
+        clauses = ["dicom = 1"] + [f"{column} = ?" for column in filters]
+        return " AND ".join(clauses), list(filters.values())
+
+    def find(self, **filters):
+        """Rows of the DICOM files matching column=value filters, e.g. find(modality="MR")."""
+        where, params = self._where(filters)
+        return [dict(row) for row in self.db.execute(f"SELECT * FROM files WHERE {where} ORDER BY path", params)]
+
+    def series(self, **filters):
+        """One summary row per series with files matching the filters."""
+        where, params = self._where(filters)
+        query = (f"SELECT series_uid, study_uid, patient_id, modality, study_date, series_description, "
+                 f"COUNT(*) AS files, SUM(COALESCE(frames, 1)) AS slices, height, width, "
+                 f"row_spacing, column_spacing FROM files WHERE {where} "
+                 f"GROUP BY series_uid ORDER BY patient_id, study_date, series_uid")
+        return [dict(row) for row in self.db.execute(query, params)]
+
+    def series_files(self, series_uid):
+        """Paths of one series in slice order."""
+        rows = self.db.execute("SELECT path FROM files WHERE dicom = 1 AND series_uid = ? "
+                               "ORDER BY slice_position, instance_number, path", (series_uid,))
+        return [row["path"] for row in rows]
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def query_filters(args):
+    """Column filters from the --patient-id/--study-uid/--series-uid/--modality options."""
+    names = ("patient_id", "study_uid", "series_uid", "modality")
+    return {name: getattr(args, name) for name in names if getattr(args, name, None)}
+
+def add_query_arguments(parser):
+    parser.add_argument("--patient-id")
+    parser.add_argument("--study-uid")
+    parser.add_argument("--series-uid")
+    parser.add_argument("--modality")
+
+def main():
+    parser = argparse.ArgumentParser(description="Index DICOM headers in SQLite and query them.")
+    parser.add_argument("--index", default=INDEX_PATH, help="SQLite file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan = commands.add_parser("scan", help="Add or refresh every file below a folder")
+    scan.add_argument("folder")
+    scan.add_argument("--workers", type=int, default=0, help="Header reader processes (0 = all cores)")
+    query = commands.add_parser("series", help="List the indexed series matching the filters")
+    add_query_arguments(query)
+    args = parser.parse_args()
+
+    with DicomIndex(args.index) as index:
+        if args.command == "scan":
+            start = time.perf_counter()
+            counts = index.scan(args.folder, args.workers or None)
+            print(f"{counts['files']} files in {time.perf_counter() - start:.2f}s: {counts['read']} read, "
+                  f"{counts['unchanged']} unchanged, {counts['removed']} removed")
+        else:
+            for row in index.series(**query_filters(args)):
+                print(f"{row['patient_id']} {row['study_date'] or '-'} {row['modality']} "
+                      f"{row['slices']} x {row['width']}x{row['height']} "
+                      f"{row['series_description'] or ''} series {row['series_uid']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import numpy as np
+from dicom_volume import DicomVolume
+
+SERIES_CACHE = "dicom_cache/series"
+PLANES = ("axial", "coronal", "sagittal")
+DENOISERS = ("median", "bilateral", "crimmins", "mymethod", "nlm")
+# Slices handed to a worker per task
+DEFAULT_CHUNK = 4
+
+def find_dicom_files(folder):
+    """Every file below folder, sorted; DICOM files often have no extension."""
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        paths.extend(os.path.join(root, f) for f in files if not f.startswith("."))
+    return sorted(paths)
+
+def _series_key(paths, series_uid):
+    ident = [series_uid or ""]
+    for path in paths:
+        stat = os.stat(path)
+        ident.append(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}")
+    return hashlib.sha256("\n".join(ident).encode()).hexdigest()
+
+def _position_along_normal(orientation, position):
+    """ImagePositionPatient projected onto the normal of ImageOrientationPatient."""
+    if position is None or orientation is None:
+        return None
+    orientation = np.asarray(orientation, np.float64)
+    normal = np.cross(orientation[:3], orientation[3:])
+    return float(np.dot(normal, np.asarray(position, np.float64)))
+
+def _slice_position(ds):
+    """Distance along the slice normal, or None without the patient geometry tags."""
+    return _position_along_normal(getattr(ds, "ImageOrientationPatient", None),
+                                  getattr(ds, "ImagePositionPatient", None))
+
+def _frame_count(ds):
+    return int(getattr(ds, "NumberOfFrames", 1) or 1)
+
+def _sort_key(header):
+    """ImagePositionPatient along the normal, then InstanceNumber, then the file name."""
+    path, ds = header
+    position = _slice_position(ds)
+    instance = getattr(ds, "InstanceNumber", None)
+    return (position is None, position or 0.0,
+            instance is None, int(instance or 0), path)
+
+def _open_series(paths, series_uid):
+    """(path, header) of every image file of one series, in slice order; no pixel data is read."""
+    import pydicom
+    from pydicom.errors import InvalidDicomError
+    headers, uids = [], set()
+    for path in paths:
+        try:
+            ds = pydicom.dcmread(path, stop_before_pixels=True)
+        except InvalidDicomError:
+            continue
+        if "Rows" not in ds:  # Not an image (notes, DICOMDIR, ...)
+            continue
+        uid = str(getattr(ds, "SeriesInstanceUID", ""))
+        if series_uid is None or uid == series_uid:
+            headers.append((path, ds))
+            uids.add(uid)
+    if not headers:
+        raise ValueError("No DICOM images found" + (f" for series {series_uid}" if series_uid else ""))
+    if len(uids) > 1:
+        raise ValueError(f"Folder holds {len(uids)} series, pick one with series_uid: {sorted(uids)}")
+    shapes = {(int(ds.Rows), int(ds.Columns)) for _, ds in headers}
+    if len(shapes) > 1:
+        raise ValueError(f"Slices of different sizes in one series: {sorted(shapes)}")
+    return sorted(headers, key=_sort_key)
+
+def _rescale(ds):
+    return float(getattr(ds, "RescaleSlope", 1) or 1), float(getattr(ds, "RescaleIntercept", 0) or 0)
+
+def _spacing(headers):
+    """(slice, row, column) spacing in mm; 1.0 where the headers do not say."""
+    ds = headers[0][1]
+    row, column = (float(v) for v in getattr(ds, "PixelSpacing", None) or (1.0, 1.0))
+    positions = [_slice_position(ds) for _, ds in headers]
+    if len(headers) > 1 and None not in positions:
+        between = float(np.median(np.abs(np.diff(positions))))
+    else:
+        between = float(getattr(ds, "SpacingBetweenSlices", 0) or getattr(ds, "SliceThickness", 0) or 0)
+    return (between or 1.0, row, column)
+
+def _build(headers, npy_path):
+    """Copy every slice into one contiguous (slices, rows, columns) .npy file.
+
+    Files are opened one at a time, so only one slice's pixel data is
+    mapped or decoded at once. Stored values are kept as they are unless
+    the slices disagree on RescaleSlope/RescaleIntercept, in which case the
+    modality values are stored as float32 so the slices stay comparable.
+    """
+    rescales = [_rescale(ds) for _, ds in headers]
+    uniform = len(set(rescales)) == 1
+    first = DicomVolume(headers[0][0]).raw_frame(0)
+    dtype = first.dtype.newbyteorder("=") if uniform else np.dtype(np.float32)
+    shape = (sum(_frame_count(ds) for _, ds in headers), first.shape[0], first.shape[1])
+    del first
+
+    partial = f"{npy_path}.{os.getpid()}.part"
+    out = np.lib.format.open_memmap(partial, mode="w+", dtype=dtype, shape=shape)
+    index = 0
+    for (path, _), (slope, intercept) in zip(headers, rescales):
+        volume = DicomVolume(path)
+        for frame in range(len(volume)):
+            if uniform:
+                out[index] = volume.raw_frame(frame)
+            else:
+                out[index] = volume.raw_frame(frame) * slope + intercept
+            index += 1
+        del volume
+    out.flush()
+    del out
+    os.replace(partial, npy_path)
+    return rescales[0] if uniform else (1.0, 0.0)
+
+class DicomSeries:
+    """A DICOM series directory as one memory-mapped (slices, rows, columns) array.
+
+    Slices are sorted by ImagePositionPatient (InstanceNumber as fallback)
+    and copied once into a .npy file under cache_dir, keyed by the paths,
+    sizes and mtimes of the files; later opens map that file directly and
+    parse no DICOM at all. Axial, coronal and sagittal views are strided
+    views of the same mapping, so switching planes copies nothing.
+    """
+
+    def __init__(self, folder, series_uid=None, cache_dir=SERIES_CACHE):
+        self.folder = folder
+        os.makedirs(cache_dir, exist_ok=True)
+        # A directory, or the files of the series, e.g. from DicomIndex.series_files
+        paths = find_dicom_files(folder) if isinstance(folder, str) else sorted(folder)
+        key = _series_key(paths, series_uid)
+        self.path = os.path.join(cache_dir, key + ".npy")
+        info_path = os.path.join(cache_dir, key + ".json")
+        self.cached = os.path.exists(self.path) and os.path.exists(info_path)
+        if self.cached:
+            with open(info_path) as f:
+                info = json.load(f)
+        else:
+            headers = _open_series(paths, series_uid)
+            slope, intercept = _build(headers, self.path)
+            info = {
+                "files": [path for path, _ in headers],
+                "series_uid": str(getattr(headers[0][1], "SeriesInstanceUID", "")),
+                "spacing": _spacing(headers),
+                "slope": slope,
+                "intercept": intercept,
+            }
+            with open(info_path, "w") as f:
+                json.dump(info, f)
+        self.files = info["files"]
+        self.series_uid = info["series_uid"]
+        self.spacing = tuple(info["spacing"])
+        self.slope, self.intercept = info["slope"], info["intercept"]
+        self.array = np.load(self.path, mmap_mode="r")
+        self.shape = self.array.shape
+        self._range = None
+
+    def view(self, plane="axial"):
+        """The volume with axis 0 running across the given plane; a view, never a copy."""
+        return plane_view(self.array, plane)
+
+    def axial(self, index):
+        return self.array[index]
+
+    def coronal(self, index):
+        return self.array[:, index, :]
+
+    def sagittal(self, index):
+        return self.array[:, :, index]
+
+    def aspect(self, plane="axial"):
+        """Height/width of one displayed pixel, for imshow(aspect=...)."""
+        between, row, column = self.spacing
+        return {"axial": row / column, "coronal": between / column, "sagittal": between / row}[plane]
+
+    def value_range(self):
+        """(min, max) of the stored values, streamed slice by slice."""
+        if self._range is None:
+            low, high = np.inf, -np.inf
+            for frame in self.array:
+                low = min(low, float(frame.min()))
+                high = max(high, float(frame.max()))
+            self._range = (low, high)
+        return self._range
+
+    def plane(self, plane="axial"):
+        """Slices of one plane with the DicomVolume interface (frame, value_range, len)."""
+        return SeriesPlane(self, plane)
+
+    def __len__(self):
+        return self.shape[0]
+
+class SeriesPlane:
+    """One plane of a DicomSeries, usable wherever a DicomVolume is (SliceRenderer, the viewer)."""
+
+    def __init__(self, series, plane="axial"):
+        self.series = series
+        self.name = plane
+        self.slices = series.view(plane)
+        self.shape = self.slices.shape
+        self.aspect = series.aspect(plane)
+
+    def value_range(self):
+        return self.series.value_range()
+
+    def raw_frame(self, index):
+        return self.slices[index]
+
+    def frame(self, index):
+        """One slice normalized to [0, 1] as float32."""
+        low, high = self.value_range()
+        frame = self.slices[index].astype(np.float32)
+        frame -= low
+        frame /= (high - low) or 1.0
+        return frame
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        return self.frame(index)
+
+def plane_view(volume, plane):
+    """Transpose a (slices, rows, columns) array so axis 0 indexes the given plane."""
+    if plane == "axial":
+        return volume
+    if plane == "coronal":
+        return volume.transpose(1, 0, 2)
+    if plane == "sagittal":
+        return volume.transpose(2, 0, 1)
+    raise ValueError(f"Unknown plane {plane!r}, expected one of {PLANES}")
+
+def to_uint8(frame, low, high):
+    """Map stored values from [low, high] to 0..255 for the uint8 filters."""
+    import cv2
+    scale = 255.0 / ((high - low) or 1.0)
+    return cv2.convertScaleAbs(np.ascontiguousarray(frame), alpha=scale, beta=-low * scale)
+
+def _denoise_slices(src_path, dst_path, name, plane, value_range, start, stop):
+    """Worker entry point: filter slices start..stop of one plane, reading and writing the .npy maps."""
+    from tiling import tile_filters
+    func = tile_filters()[name][0]
+    src = plane_view(np.load(src_path, mmap_mode="r"), plane)
+    dst = np.load(dst_path, mmap_mode="r+")
+    out = plane_view(dst, plane)
+    for index in range(start, stop):
+        out[index] = func(to_uint8(src[index], *value_range))
+    dst.flush()
+    return stop - start
+
+def denoise_volume(series, name, output, plane="axial", workers=None, chunk=DEFAULT_CHUNK, pool=None):
+    """Run a 2-D denoiser over every slice of one plane, slices spread over a process pool.
+
+    The filters work on uint8, so slices are mapped to 0..255 with the
+    series' global value range first and the output is a uint8 .npy
+    (memory-mapped, same shape as the series). Workers open the cached
+    series and the output file themselves; no pixel data is pickled.
+    Pass an existing pool (parallel.make_pool) to skip the worker start-up.
+    Returns the output opened read-only.
+    """
+    if name not in DENOISERS:
+        raise ValueError(f"Unknown denoiser {name!r}, expected one of {DENOISERS}")
+    out = np.lib.format.open_memmap(output, mode="w+", dtype=np.uint8, shape=series.shape)
+    del out
+    value_range = series.value_range()
+    count = len(plane_view(series.array, plane))
+    chunks = [(start, min(start + chunk, count)) for start in range(0, count, chunk)]
+    if pool is None and workers == 1:
+        for start, stop in chunks:
+            _denoise_slices(series.path, output, name, plane, value_range, start, stop)
+    elif pool is None:
+        from parallel import make_pool
+        with make_pool(workers) as pool:
+            return denoise_volume(series, name, output, plane, chunk=chunk, pool=pool)
+    else:
+        futures = [pool.submit(_denoise_slices, series.path, output, name, plane, value_range, start, stop)
+                   for start, stop in chunks]
+        for future in futures:
+            future.result()
+    return np.load(output, mmap_mode="r")
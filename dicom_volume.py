@@ -0,0 +1,131 @@
+import os
+import numpy as np
+
+PIXEL_DATA_TAG = 0x7FE00010
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+def fetch_dicom(url, cache_path):
+    """Download a DICOM file to cache_path in chunks, unless it is already cached."""
+    if os.path.exists(cache_path):
+        return cache_path
+    import requests
+
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    partial_path = cache_path + ".part"
+    with requests.get(url, stream=True) as response:
+        response.raise_for_status()  # Ensure request was successful
+        with open(partial_path, "wb") as f:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+    os.replace(partial_path, cache_path)
+    return cache_path
+
+class DicomVolume:
+    """Lazily decoded view of the frames in a local DICOM file.
+
+    Uncompressed pixel data is memory-mapped straight from the file, so a
+    frame costs nothing until it is read. Compressed pixel data is decoded
+    one frame at a time when requested.
+    """
+
+    def __init__(self, path, normalization="minmax", sample_frames=16):
+        self.path = path
+        import pydicom
+        # Large values (the pixel data above all) are left on disk until accessed
+        self.dataset = pydicom.dcmread(path, defer_size="64 KB")
+        ds = self.dataset
+        self.rows = int(ds.Rows)
+        self.columns = int(ds.Columns)
+        self.num_frames = int(getattr(ds, "NumberOfFrames", 1) or 1)
+        self.shape = (self.num_frames, self.rows, self.columns)
+        self._frames = self._map_pixel_data()
+        self._full_array = None
+        self.normalization = normalization
+        self.sample_frames = sample_frames
+        self._range = None
+
+    def _map_pixel_data(self):
+        """Memory-map native pixel data; returns None for compressed transfer syntaxes."""
+        from pydicom.uid import ExplicitVRBigEndian
+        ds = self.dataset
+        transfer_syntax = ds.file_meta.TransferSyntaxUID
+        if transfer_syntax.is_compressed or transfer_syntax.is_deflated:
+            return None
+        if int(getattr(ds, "SamplesPerPixel", 1)) != 1:
+            return None
+        bits = int(ds.BitsAllocated)
+        if bits not in (8, 16, 32):
+            return None
+        kind = "i" if int(getattr(ds, "PixelRepresentation", 0)) else "u"
+        order = ">" if transfer_syntax == ExplicitVRBigEndian else "<"
+        dtype = np.dtype(f"{order}{kind}{bits // 8}")
+
+        try:
+            # Without keep_deferred pydicom 3 reads the deferred value, and the offset with it
+            element = ds.get_item(PIXEL_DATA_TAG, keep_deferred=True)
+        except TypeError:  # pydicom < 3 never reads deferred values in get_item
+            element = ds.get_item(PIXEL_DATA_TAG)
+        offset = getattr(element, "value_tell", None)
+        if offset is None:  # Pixel data was small enough to be read eagerly
+            return np.frombuffer(ds.PixelData, dtype).reshape(self.shape)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=self.shape)
+
+    def raw_frame(self, index):
+        """Stored values of one frame, decoded on demand."""
+        if self._frames is not None:
+            return self._frames[index]
+        try:
+            from pydicom.pixels import pixel_array
+        except ImportError:  # pydicom < 3 can only decode the whole volume
+            if self._full_array is None:
+                self._full_array = self.dataset.pixel_array.reshape(self.shape)
+            return self._full_array[index]
+        return pixel_array(self.path, index=index if self.num_frames > 1 else None)
+
+    def _frame_indices(self):
+        if self.normalization == "sample" and self.num_frames > self.sample_frames:
+            return np.linspace(0, self.num_frames - 1, self.sample_frames).round().astype(int)
+        return range(self.num_frames)
+
+    def value_range(self):
+        """(min, max) used for normalization, streamed frame by frame.
+
+        "minmax" visits every frame; "sample" only looks at sample_frames
+        evenly spaced frames, trading exactness for a faster first slice.
+        """
+        if self._range is None:
+            low, high = np.inf, -np.inf
+            for index in self._frame_indices():
+                frame = self.raw_frame(index)
+                low = min(low, float(frame.min()))
+                high = max(high, float(frame.max()))
+            self._range = (low, high)
+        return self._range
+
+    def frame(self, index):
+        """One slice normalized to [0, 1] as float32."""
+        low, high = self.value_range()
+        frame = self.raw_frame(index).astype(np.float32)
+        frame -= low
+        frame /= (high - low) or 1.0
+        if self.normalization == "sample":
+            np.clip(frame, 0.0, 1.0, out=frame)
+        return frame
+
+    def metadata(self):
+        """All header elements except the pixel data, keyed by keyword."""
+        from pydicom.datadict import keyword_for_tag
+        ds = self.dataset
+        metadata = {}
+        # Walk the tags rather than the elements so the deferred pixel data is never read
+        for tag in ds.keys():
+            keyword = keyword_for_tag(tag)
+            if keyword and keyword != "PixelData":
+                metadata[keyword] = getattr(ds, keyword, "Not Available")
+        return metadata
+
+    def __len__(self):
+        return self.num_frames
+
+    def __getitem__(self, index):
+        return self.frame(index)
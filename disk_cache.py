@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+import numpy as np
+
+# Partial files older than this were left behind by a writer that crashed
+STALE_PART_SECONDS = 3600
+
+class NpyCache:
+    """Arrays stored as .npy files in a directory, with least recently used eviction.
+
+    Once the directory grows past max_bytes the least recently used entries
+    are removed. The size is kept as a running total, so the directory is
+    only listed when the total goes over the limit (or another process's
+    entries are found then). Subclasses provide key(); mmap_mode is passed
+    to np.load for hits.
+    """
+
+    mmap_mode = None
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._bytes = self.evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            result = np.load(path, mmap_mode=self.mmap_mode)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError):  # Missing, evicted meanwhile, or half written
+            return None
+        return result
+
+    def put(self, key, result):
+        path = self._path(key)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(partial, "wb") as f:
+            np.save(f, result)
+            size = f.tell()
+        os.replace(partial, path)
+        with self._lock:
+            self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._bytes = self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes; returns the size left.
+
+        Stale .part files of crashed writers are removed on the way. Evicted
+        entries that are still memory-mapped stay readable until unmapped.
+        """
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+                if name.endswith(".part") and now - stat.st_mtime > STALE_PART_SECONDS:
+                    os.remove(path)
+            except FileNotFoundError:  # Evicted or renamed by another thread or process
+                continue
+            if name.endswith(".npy"):
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
@@ -0,0 +1,118 @@
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+import disk_cache
+import profiling
+
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg')
+
+# Decoded images kept in flight ahead of the consumer
+DEFAULT_PREFETCH = 8
+
+class DecodeCache(disk_cache.NpyCache):
+    """Decoded grayscale images stored as .npy files, keyed by path, size and mtime.
+
+    Hits are returned as read-only memory maps, so a warm run skips the
+    JPEG/PNG decode entirely. Editing a file changes its key; the stale entry
+    is never read again and ages out like any other: once the directory
+    grows past max_bytes the least recently used entries are removed.
+    """
+
+    mmap_mode = "r"
+
+    def __init__(self, directory="decode_cache", max_bytes=2**30):
+        super().__init__(directory, max_bytes)
+
+    @staticmethod
+    def key(path):
+        stat = os.stat(path)
+        ident = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.sha256(ident.encode()).hexdigest()
+
+_default_cache = None
+
+def set_default_cache(cache):
+    """Cache used by read_image() when none is passed explicitly (None disables it)."""
+    global _default_cache
+    _default_cache = cache
+
+_NO_CACHE = object()
+
+def list_images(folder):
+    """Image file names directly inside folder, sorted."""
+    return sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+def find_images(input_dir):
+    """Walk the input tree and yield image paths in a stable order."""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for f in sorted(files):
+            if f.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, f)
+
+def read_image(path, cache=_NO_CACHE):
+    """Decode one image as grayscale, raising OSError when it cannot be read."""
+    if cache is _NO_CACHE:
+        cache = _default_cache
+    with profiling.stage("load", image=path):
+        key = None
+        if cache is not None:
+            key = cache.key(path)
+            img = cache.get(key)
+            if img is not None:
+                return img
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise OSError(f"Could not read {path}")
+        if cache is not None:
+            cache.put(key, img)
+        return img
+
+def iter_images(paths, workers=None, prefetch=DEFAULT_PREFETCH, cache=_NO_CACHE, failed=None, verbose=True):
+    """Yield (path, img) in input order while later images decode on a thread pool.
+
+    At most prefetch decoded images wait for the consumer, so memory stays
+    bounded however many paths there are. prefetch=0 decodes each image in
+    the calling thread when it is asked for. Unreadable files are skipped
+    and appended to failed when a list is given.
+    """
+    def read(path):
+        return read_image(path, cache)
+
+    for path, result in _decoded(iter(paths), read, workers, prefetch):
+        try:
+            img = result()
+        except OSError:
+            if failed is not None:
+                failed.append(path)
+            if verbose:
+                print(f"Skipping unreadable image: {path}")
+            continue
+        yield path, img
+
+def _decoded(paths, read, workers, prefetch):
+    """(path, function returning the decoded image) in input order."""
+    if prefetch == 0:
+        for path in paths:
+            yield path, lambda path=path: read(path)
+        return
+    with ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append((path, pool.submit(read, path)))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            path, future = pending.popleft()
+            for next_path in paths:  # Keep the queue full
+                pending.append((next_path, pool.submit(read, next_path)))
+                break
+            yield path, future.result
+
+def load_images(folder, files, **kwargs):
+    """(file name, image) pairs for the given files of folder, decoded in parallel."""
+    paths = [os.path.join(folder, f) for f in files]
+    return [(os.path.basename(path), img) for path, img in iter_images(paths, **kwargs)]
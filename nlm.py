@@ -0,0 +1,92 @@
+import hashlib
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+import disk_cache
+import profiling
+
+# Parameters used by task_1_denoise.denoise_image
+DEFAULT_H = 30
+DEFAULT_TEMPLATE_WINDOW = 7
+DEFAULT_SEARCH_WINDOW = 21
+
+# Approximate modes: "reduced" shrinks the search window, "downsampled"
+# denoises a half-size image with halved windows and upsamples the result.
+REDUCED_SEARCH_WINDOW = 11
+MODES = ("exact", "reduced", "downsampled")
+
+class DenoiseCache(disk_cache.NpyCache):
+    """On-disk cache of denoised images, keyed by image content and NLM parameters.
+
+    Least recently used entries are removed once the directory grows past
+    max_bytes.
+    """
+
+    def __init__(self, directory="nlm_cache", max_bytes=512 * 2**20):
+        super().__init__(directory, max_bytes)
+
+    @staticmethod
+    def key(img, h, template_window, search_window, mode):
+        digest = hashlib.sha256()
+        digest.update(f"{img.shape}|{img.dtype}|{h}|{template_window}|{search_window}|{mode}".encode())
+        digest.update(np.ascontiguousarray(img).data)
+        return digest.hexdigest()
+
+_default_cache = None
+
+def set_default_cache(cache):
+    """Cache used by denoise() when none is passed explicitly (None disables it)."""
+    global _default_cache
+    _default_cache = cache
+
+def _denoise_uncached(img, h, template_window, search_window, mode):
+    if mode == "exact":
+        return cv2.fastNlMeansDenoising(img, None, h, template_window, search_window)
+    if mode == "reduced":
+        return cv2.fastNlMeansDenoising(img, None, h, template_window,
+                                        min(search_window, REDUCED_SEARCH_WINDOW))
+    if mode == "downsampled":
+        height, width = img.shape[:2]
+        small = cv2.resize(img, (max(width // 2, 1), max(height // 2, 1)), interpolation=cv2.INTER_AREA)
+        # Halve the windows along with the image; they must stay odd
+        small_template = max(template_window // 2, 1) | 1
+        small_search = max(search_window // 2, 1) | 1
+        small = cv2.fastNlMeansDenoising(small, None, h, small_template, small_search)
+        return cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    raise ValueError(f"Unknown NLM mode: {mode}")
+
+_NO_CACHE = object()
+
+@profiling.profiled("nlm")
+def denoise(img, h=DEFAULT_H, template_window=DEFAULT_TEMPLATE_WINDOW,
+            search_window=DEFAULT_SEARCH_WINDOW, mode="exact", cache=_NO_CACHE):
+    """Non-local means denoising with optional result caching and approximate modes."""
+    if cache is _NO_CACHE:
+        cache = _default_cache
+    if cache is None:
+        return _denoise_uncached(img, h, template_window, search_window, mode)
+    key = cache.key(img, h, template_window, search_window, mode)
+    result = cache.get(key)
+    if result is None:
+        result = _denoise_uncached(img, h, template_window, search_window, mode)
+        cache.put(key, result)
+    return result
+
+def denoise_batch(images, h=DEFAULT_H, template_window=DEFAULT_TEMPLATE_WINDOW,
+                  search_window=DEFAULT_SEARCH_WINDOW, mode="exact", cache=_NO_CACHE, workers=None,
+                  labels=None):
+    """Denoise several images at once on a thread pool (OpenCV releases the GIL).
+
+    Cached images are returned without recomputation; results keep the input order.
+    labels, one per image, attribute each image's "nlm" stage to it when profiling.
+    """
+    def run(img, label):
+        if label is None:
+            return denoise(img, h, template_window, search_window, mode, cache)
+        with profiling.image(label, span=False):
+            return denoise(img, h, template_window, search_window, mode, cache)
+
+    with ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+        return list(pool.map(run, images, labels if labels is not None else itertools.repeat(None)))
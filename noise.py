@@ -0,0 +1,199 @@
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+import image_io
+import profiling
+
+# Noise is measured on random patches, so the cost does not grow with the image
+PATCH_SIZE = 32
+PATCH_COUNT = 64
+# Downsampling factors the noise is measured at; grain of a few pixels only shows at the coarser ones
+SCALES = (1, 2, 4)
+# A pixel this much darker/brighter than all 8 neighbours, at an extreme value, is an impulse
+IMPULSE_JUMP = 64
+DARK_IMPULSE_FRACTION = 0.0005
+HEAVY_IMPULSE_FRACTION = 0.04
+# Line art: nearly every pixel is black or white
+TWO_LEVEL_FRACTION = 0.97
+CLEAN_SIGMA = 1.5
+# Slope of noise sigma against brightness, relative: 0 for additive noise, 1 for multiplicative
+SPECKLE_ELASTICITY = 0.4
+# Above this, white Gaussian noise is better served by NLM than by the bilateral filter
+BILATERAL_SIGMA = 30.0
+MAX_H = 80
+# median |Laplacian residual| = 0.6745 * 6 * sigma for Gaussian noise (the kernel's L2 norm is 6)
+_MAD_TO_SIGMA = 1.0 / (0.6745 * 6.0)
+
+def _sample_patches(img, size, count, rng):
+    """count random size x size patches as int16, or the whole image when it is smaller."""
+    height, width = img.shape
+    if height < size or width < size:
+        return img[None].astype(np.int16)
+    ys = rng.integers(0, height - size + 1, count)
+    xs = rng.integers(0, width - size + 1, count)
+    windows = np.lib.stride_tricks.sliding_window_view(img, (size, size))
+    return windows[ys, xs].astype(np.int16)
+
+def _neighbours(patches):
+    """Centre pixels and the 8 shifted neighbour views of a (K, H, W) patch stack."""
+    height, width = patches.shape[1:]
+    shift = lambda dy, dx: patches[:, 1 + dy:height - 1 + dy, 1 + dx:width - 1 + dx]
+    centre = shift(0, 0)
+    return centre, {(dy, dx): shift(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx}
+
+def _patch_noise(patches):
+    """Per patch: mean brightness and robust noise sigma (Immerkaer's Laplacian residual, median based).
+
+    The residual cancels smooth structure; taking the median rather than the
+    mean of its magnitude keeps edges and isolated impulses from inflating
+    the estimate.
+    """
+    centre, n = _neighbours(patches)
+    residual = (n[-1, -1] + n[-1, 1] + n[1, -1] + n[1, 1]) - 2 * (n[-1, 0] + n[1, 0] + n[0, -1] + n[0, 1])
+    residual += 4 * centre
+    np.abs(residual, out=residual)
+    # The residual of 8-bit pixels is a small integer: int16 keeps the partition cheap
+    residual = residual.reshape(len(patches), -1)
+    middle = residual.shape[1] // 2
+    sigma = np.partition(residual, middle, axis=1)[:, middle] * _MAD_TO_SIGMA
+    return patches.reshape(len(patches), -1).mean(axis=1), sigma
+
+def _impulse_fractions(patches):
+    """Fractions of dark and of bright pixels that differ from all 8 neighbours by IMPULSE_JUMP."""
+    centre, n = _neighbours(patches)
+    neighbours = np.stack(list(n.values()))
+    dark = (centre <= 5) & (neighbours.min(axis=0) - centre > IMPULSE_JUMP)
+    bright = (centre >= 250) & (centre - neighbours.max(axis=0) > IMPULSE_JUMP)
+    return float(dark.mean()), float(bright.mean())
+
+def _downsample(img):
+    """2x2 mean; cropped to an even size first, where INTER_AREA would otherwise also smooth."""
+    height, width = img.shape[0] // 2, img.shape[1] // 2
+    return cv2.resize(img[:2 * height, :2 * width], (width, height), interpolation=cv2.INTER_AREA)
+
+def _elasticity(means, sigmas, sigma):
+    """Relative slope of patch sigma against patch brightness; nan when brightness barely varies."""
+    usable = (means > sigma + 8) & (means < 247 - sigma)  # Clipping flattens the noise near 0 and 255
+    means, sigmas = means[usable], sigmas[usable]
+    if len(means) < 8 or means.std() < 5 or sigmas.mean() <= 0:
+        return float("nan")
+    slope = np.polyfit(means, sigmas, 1)[0]
+    return float(slope * means.mean() / sigmas.mean())
+
+@profiling.profiled("noise_estimate")
+def estimate_noise(img, seed=0):
+    """Characterize the noise of a uint8 grayscale image from random patches.
+
+    sigma is measured on the image and on 2x and 4x downsampled copies.
+    Averaging k x k pixels divides white noise by k but hardly touches noise
+    with a grain of k pixels, so each scale's sigma is weighted by sqrt(k)
+    and the largest is kept; on synthetic noise with 1, 2 and 4 pixel grain
+    that lands within about 20% of the true sigma. Returns a dict with the
+    noise kind ("line_art", "impulse", "clean", "speckle" or "gaussian"),
+    sigma, the scale it came from, impulse_fraction, elasticity and the
+    two_level fraction.
+    """
+    rng = np.random.default_rng(seed)
+    full = _sample_patches(img, PATCH_SIZE + 2, PATCH_COUNT, rng)
+    best = 0.0, 1, np.zeros(0), np.zeros(0)  # Images under 3 pixels across: nothing to measure
+    scaled = img
+    for scale in SCALES:
+        if scale > 1:
+            scaled = _downsample(scaled)
+        if min(scaled.shape) < 3:
+            break
+        patches = full if scale == 1 else _sample_patches(scaled, PATCH_SIZE + 2, PATCH_COUNT, rng)
+        means, sigmas = _patch_noise(patches)
+        sigma = float(np.median(sigmas)) * scale ** 0.5
+        if sigma > best[0]:
+            best = sigma, scale, means, sigmas
+    sigma, scale, means, sigmas = best
+    dark, bright = _impulse_fractions(full) if min(full.shape[1:]) >= 3 else (0.0, 0.0)
+    estimate = {
+        "sigma": sigma,
+        "scale": scale,
+        "impulse_fraction": dark + bright,
+        "elasticity": _elasticity(means, sigmas, sigma / scale ** 0.5),
+        "two_level": float(((full <= 16) | (full >= 239)).mean()),
+    }
+    # Speckle clips its bright tail into isolated white pixels but never makes
+    # isolated black ones, so only dark impulses tell salt and pepper apart
+    if estimate["two_level"] >= TWO_LEVEL_FRACTION:
+        kind = "line_art"
+    elif dark > DARK_IMPULSE_FRACTION:
+        kind = "impulse"
+    elif sigma < CLEAN_SIGMA:
+        kind = "clean"
+    elif estimate["elasticity"] >= SPECKLE_ELASTICITY:
+        kind = "speckle"
+    else:
+        kind = "gaussian"
+    estimate["kind"] = kind
+    return estimate
+
+def choose_filter(estimate):
+    """(filter name, keyword arguments) of the existing filter that fits the estimated noise.
+
+    The choices follow bench_auto.py: median removes impulses at almost no
+    cost but erases one-pixel lines, so line art gets NLM at its tuned
+    strength. White Gaussian noise gets the bilateral filter up to
+    BILATERAL_SIGMA; speckle and coarse-grained noise get NLM, whose h has
+    to grow with the grain. myMethod never came out ahead and is not chosen.
+    """
+    import nlm
+    kind, sigma = estimate["kind"], estimate["sigma"]
+    if kind == "line_art":
+        if estimate["impulse_fraction"] > 0:
+            return "nlm", {"h": nlm.DEFAULT_H}
+        return "none", {}
+    if kind == "impulse":
+        return "median", {"kernel_size": 5 if estimate["impulse_fraction"] > HEAVY_IMPULSE_FRACTION else 3}
+    if kind == "clean":
+        return "none", {}
+    if estimate["scale"] > 1:
+        return "nlm", {"h": int(min(MAX_H, max(10, round(2 * sigma))))}
+    if kind == "speckle":
+        return "nlm", {"h": int(min(MAX_H, max(nlm.DEFAULT_H, round(1.2 * sigma))))}
+    if sigma < BILATERAL_SIGMA:
+        return "bilateral", {"kernel_size": 9, "sigma_color": round(3 * sigma), "sigma_space": 5}
+    return "nlm", {"h": int(min(MAX_H, round(1.2 * sigma)))}
+
+def filters():
+    """Filter name -> function(img, **params) for choose_filter's names."""
+    import task_1_denoise
+    import task_2_speckle as speckle
+    return {
+        "none": lambda img: img,
+        "median": speckle.apply_median_filter,
+        "bilateral": speckle.apply_bilateral_filter,
+        "mymethod": speckle.apply_my_method,
+        "nlm": task_1_denoise.denoise_image,
+    }
+
+def auto_denoise(img):
+    """Estimate the noise and run only the filter chosen for it; returns (output, estimate, (name, params))."""
+    estimate = estimate_noise(img)
+    name, params = choose_filter(estimate)
+    return filters()[name](img, **params), estimate, (name, params)
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate the noise of each image and show the filter it would get.")
+    parser.add_argument("folder", help="Folder of images, e.g. noisy/speckle")
+    args = parser.parse_args()
+
+    files = image_io.list_images(args.folder)
+    for name, img in image_io.load_images(args.folder, files):
+        start = time.perf_counter()
+        estimate = estimate_noise(img)
+        ms = (time.perf_counter() - start) * 1000
+        choice, params = choose_filter(estimate)
+        settings = ", ".join(f"{key}={value}" for key, value in params.items())
+        print(f"{os.path.basename(name):>16} {estimate['kind']:>9} sigma {estimate['sigma']:5.1f} "
+              f"(x{estimate['scale']}) "
+              f"impulses {estimate['impulse_fraction']:.4f} elasticity {estimate['elasticity']:5.2f} "
+              f"({ms:.1f} ms) -> {choice}({settings})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+# The filters and OpenCV are imported where they run, so importing this
+# module for make_pool (e.g. from dicom_index) stays cheap
+
+def _median(img):
+    import task_2_speckle as speckle
+    return speckle.apply_median_filter(img, speckle.MEDIAN_KERNEL_SIZE)
+
+def _bilateral(img):
+    import task_2_speckle as speckle
+    return speckle.apply_bilateral_filter(img, speckle.BILATERAL_KERNEL_SIZE, speckle.BILATERAL_SIGMA_COLOR,
+                                          speckle.BILATERAL_SIGMA_SPACE)
+
+def _crimmins(img):
+    import task_2_speckle as speckle
+    return speckle.apply_crimmins_speckle_removal(img, iterations=speckle.CRIMMINS_ITERATIONS)
+
+def _mymethod(img_crimmins):
+    import task_2_speckle as speckle
+    return speckle.finish_my_method(img_crimmins, speckle.OPENING_KERNEL_SIZE, speckle.CLOSING_KERNEL_SIZE)
+
+# Stage name -> (input stage, function). "input" is the original image; every
+# other input is the output of an earlier stage, so shared work runs once.
+SPECKLE_STAGES = {
+    "median": ("input", _median),
+    "bilateral": ("input", _bilateral),
+    "crimmins": ("input", _crimmins),
+    "mymethod": ("crimmins", _mymethod),
+}
+
+def init_worker():
+    """One thread per worker process; the pool itself provides the parallelism."""
+    import cv2
+    cv2.setNumThreads(1)
+    try:
+        import numba
+        numba.set_num_threads(1)
+    except ImportError:
+        pass
+
+def make_pool(workers=None, initializer=init_worker):
+    """Process pool of workers (None = all cores) for the filter pipelines.
+
+    Workers are started with forkserver: forking a parent that already
+    started numba/OpenCV thread pools can deadlock the children.
+    """
+    context = multiprocessing.get_context("forkserver")
+    return ProcessPoolExecutor(workers or os.cpu_count(), mp_context=context, initializer=initializer)
+
+def _attach(name):
+    """Attach to an existing shared memory block owned by the parent process."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Pool workers share the parent's resource tracker, so registering the
+    # block again here is a no-op and the parent's unlink() cleans it up.
+    return shared_memory.SharedMemory(name=name)
+
+def _run_stage(stage, src_name, dst_name, shape):
+    """Worker entry point: read the stage input from shared memory and write the output back."""
+    src_shm = _attach(src_name)
+    dst_shm = _attach(dst_name)
+    try:
+        src = np.ndarray(shape, np.uint8, buffer=src_shm.buf)
+        dst = np.ndarray(shape, np.uint8, buffer=dst_shm.buf)
+        dst[...] = SPECKLE_STAGES[stage][1](src)
+        del src, dst
+    finally:
+        src_shm.close()
+        dst_shm.close()
+    return stage
+
+class _ImageJob:
+    """Shared memory buffers and stage bookkeeping for one image."""
+
+    def __init__(self, key, img):
+        self.key = key
+        self.shape = img.shape
+        self.buffers = {}
+        for name in ["input"] + list(SPECKLE_STAGES):
+            self.buffers[name] = shared_memory.SharedMemory(create=True, size=max(img.nbytes, 1))
+        self.array("input")[...] = img
+        self.pending = set(SPECKLE_STAGES)
+        self.done = set()
+
+    def array(self, name):
+        return np.ndarray(self.shape, np.uint8, buffer=self.buffers[name].buf)
+
+    def ready_stages(self):
+        """Pending stages whose input is available, removed from the pending set."""
+        ready = [s for s in self.pending if SPECKLE_STAGES[s][0] in self.done | {"input"}]
+        self.pending.difference_update(ready)
+        return ready
+
+    def finished(self):
+        return len(self.done) == len(SPECKLE_STAGES)
+
+    def collect(self):
+        return {name: self.array(name).copy() for name in SPECKLE_STAGES}
+
+    def release(self):
+        for shm in self.buffers.values():
+            shm.close()
+            shm.unlink()
+        self.buffers = {}
+
+def run_speckle_parallel(images, workers=None, max_in_flight=None):
+    """Run every speckle filter on every image across a process pool.
+
+    images is an iterable of (key, uint8 image) pairs; (key, outputs) pairs
+    are yielded as soon as all stages of an image are done, so results can
+    arrive out of order. Each image is copied once into shared memory and
+    workers read it from there instead of receiving a pickled copy.
+    """
+    workers = workers or os.cpu_count()
+    max_in_flight = max_in_flight or 2 * workers
+    images = iter(images)
+    jobs = []
+    futures = {}
+    exhausted = False
+
+    def submit_ready(pool, job):
+        for stage in job.ready_stages():
+            source = SPECKLE_STAGES[stage][0]
+            future = pool.submit(_run_stage, stage, job.buffers[source].name,
+                                 job.buffers[stage].name, job.shape)
+            futures[future] = job
+
+    try:
+        with make_pool(workers) as pool:
+            while jobs or not exhausted:
+                # Keep a bounded number of images in shared memory at once
+                while not exhausted and len(jobs) < max_in_flight:
+                    try:
+                        key, img = next(images)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    job = _ImageJob(key, np.ascontiguousarray(img, dtype=np.uint8))
+                    jobs.append(job)
+                    submit_ready(pool, job)
+
+                if not futures:
+                    continue
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = futures.pop(future)
+                    job.done.add(future.result())
+                    submit_ready(pool, job)
+                    if job.finished():
+                        outputs = job.collect()
+                        job.release()
+                        jobs.remove(job)
+                        yield job.key, outputs
+    finally:
+        for job in jobs:
+            job.release()
@@ -0,0 +1,189 @@
+import functools
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Events that ran outside any image() block go to this trace
+RUN_TRACE = "run"
+
+class Profiler:
+    """Records one span per stage call: wall time, CPU time and optionally allocated bytes.
+
+    CPU time is process time, so it includes library worker threads (OpenCV,
+    numba) that run on behalf of the stage. With memory=True, tracemalloc
+    reports the peak bytes allocated during each stage; this is the only
+    part with a noticeable overhead and it is off by default. tracemalloc
+    counts the allocations of every thread, so memory peaks are only
+    meaningful when nothing else (e.g. a prefetching loader) runs alongside.
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.events = []
+        self.origin = time.perf_counter_ns()
+        self._local = threading.local()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def close(self):
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+            self._local.image = None
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name, image=None):
+        stack = self._stack()
+        frame = {"peak": 0}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:  # Keep the enclosing stage's peak before resetting it
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak - stack[-1]["base"])
+            tracemalloc.reset_peak()
+            frame["base"] = current
+        stack.append(frame)
+        wall = time.perf_counter_ns()
+        cpu = time.process_time_ns()
+        try:
+            yield
+        finally:
+            cpu = time.process_time_ns() - cpu
+            end = time.perf_counter_ns()
+            stack.pop()
+            event = {
+                "name": name,
+                "image": image or self._local.image or RUN_TRACE,
+                "tid": threading.get_ident(),
+                "start_ns": wall - self.origin,
+                "wall_ns": end - wall,
+                "cpu_ns": cpu,
+            }
+            if self.memory:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1] - frame["base"])
+                event["alloc_bytes"] = peak
+                if stack:
+                    stack[-1]["peak"] = max(stack[-1]["peak"], peak + frame["base"] - stack[-1]["base"])
+            self.events.append(event)
+
+    @contextmanager
+    def image(self, label, span=True):
+        """Attribute the stages run inside the block (on this thread) to one image.
+
+        With span=False no "image" span of its own is recorded, for work on
+        an image that is split over several blocks.
+        """
+        self._stack()
+        previous, self._local.image = self._local.image, str(label)
+        try:
+            if span:
+                with self.stage("image"):
+                    yield
+            else:
+                yield
+        finally:
+            self._local.image = previous
+
+    def summary(self):
+        """Stage name -> calls, total/mean wall ms, total CPU ms and max allocated bytes."""
+        stages = {}
+        for event in self.events:
+            entry = stages.setdefault(event["name"], {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+            entry["calls"] += 1
+            entry["wall_ms"] += event["wall_ns"] / 1e6
+            entry["cpu_ms"] += event["cpu_ns"] / 1e6
+            if "alloc_bytes" in event:
+                entry["max_alloc_bytes"] = max(entry.get("max_alloc_bytes", 0), event["alloc_bytes"])
+        for entry in stages.values():
+            entry["mean_wall_ms"] = entry["wall_ms"] / entry["calls"]
+        return dict(sorted(stages.items(), key=lambda item: -item[1]["wall_ms"]))
+
+    def print_summary(self):
+        summary = self.summary()
+        print(f"{'stage':>16} {'calls':>6} {'wall ms':>10} {'mean ms':>9} {'cpu ms':>10} {'max alloc MB':>13}")
+        for name, entry in summary.items():
+            alloc = entry.get("max_alloc_bytes")
+            alloc = f"{alloc / 2**20:.1f}" if alloc is not None else "-"
+            print(f"{name:>16} {entry['calls']:>6} {entry['wall_ms']:>10.1f} {entry['mean_wall_ms']:>9.2f} "
+                  f"{entry['cpu_ms']:>10.1f} {alloc:>13}")
+
+    def chrome_trace(self, image=None):
+        """Events in Chrome trace format (chrome://tracing, Perfetto), optionally for one image."""
+        pid = os.getpid()
+        threads = {}
+        trace = []
+        for event in self.events:
+            if image is not None and event["image"] != image:
+                continue
+            tid = threads.setdefault(event["tid"], len(threads))
+            args = {"image": event["image"], "cpu_ms": event["cpu_ns"] / 1e6}
+            if "alloc_bytes" in event:
+                args["alloc_bytes"] = event["alloc_bytes"]
+            trace.append({"name": event["name"], "cat": "stage", "ph": "X", "pid": pid, "tid": tid,
+                          "ts": event["start_ns"] / 1e3, "dur": event["wall_ns"] / 1e3, "args": args})
+        for ident, tid in threads.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                          "args": {"name": "main" if ident == threading.main_thread().ident else f"worker {tid}"}})
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def write(self, directory):
+        """One <image>.trace.json per image plus summary.json in directory."""
+        os.makedirs(directory, exist_ok=True)
+        for image in sorted({event["image"] for event in self.events}):
+            name = re.sub(r"[^\w.-]+", "_", image).strip("_") or RUN_TRACE
+            with open(os.path.join(directory, f"{name}.trace.json"), "w") as f:
+                json.dump(self.chrome_trace(image), f)
+        with open(os.path.join(directory, "summary.json"), "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+_profiler = None
+_NULL = nullcontext()
+
+def enable(memory=False):
+    """Start recording stages in this process and return the profiler."""
+    global _profiler
+    _profiler = Profiler(memory)
+    return _profiler
+
+def disable():
+    """Stop recording and return the profiler that was active, if any."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.close()
+    return profiler
+
+def tracks_memory():
+    """True when stages record allocated bytes; loaders should then run serially."""
+    return _profiler is not None and _profiler.memory
+
+def stage(name, image=None):
+    """Context manager timing one stage; a shared no-op when profiling is off."""
+    if _profiler is None:
+        return _NULL
+    return _profiler.stage(name, image)
+
+def image(label, span=True):
+    """Context manager attributing the enclosed stages to one image."""
+    if _profiler is None:
+        return _NULL
+    return _profiler.image(label, span)
+
+def profiled(name):
+    """Decorator recording every call of a function as the given stage."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            with _profiler.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,41 @@
+import os
+import re
+import cv2
+import profiling
+
+def slugify(title):
+    """Turn a stage title such as 'Closing K=2' into a file-name friendly 'closing_k2'."""
+    return re.sub(r"[^a-z0-9]+", "_", title.lower().replace("=", "")).strip("_")
+
+class PipelineResult:
+    """Stage outputs of one pipeline run, computed once and shared by display and save."""
+
+    def __init__(self, filename, steps):
+        self.filename = filename
+        self.steps = list(steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __getitem__(self, title):
+        for step_title, image in self.steps:
+            if step_title == title:
+                return image
+        raise KeyError(title)
+
+    @profiling.profiled("save_images")
+    def save_images(self, output_folder, skip=("Original",)):
+        """Write each stage array straight to a PNG file, without any figure rendering."""
+        os.makedirs(output_folder, exist_ok=True)
+        paths = []
+        for title, image in self.steps:
+            if title in skip:
+                continue
+            path = os.path.join(output_folder, f"{self.filename}_{slugify(title)}.png")
+            if not cv2.imwrite(path, image):
+                raise OSError(f"Could not write {path}")
+            paths.append(path)
+        return paths
@@ -0,0 +1,301 @@
+import argparse
+import io
+import json
+import os
+import signal
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import cv2
+import numpy as np
+
+DEFAULT_PORT = 8350
+DEFAULT_DEADLINE_MS = 30000
+# DICOM volumes kept open per worker
+VOLUME_CACHE_SIZE = 4
+
+class DeadlineExceeded(Exception):
+    pass
+
+class BadRequest(Exception):
+    pass
+
+class NotFound(Exception):
+    pass
+
+# ---------------------------------------------------------------- worker side
+
+_volumes = OrderedDict()
+
+def _warm_worker():
+    """Pool initializer: import everything and run each pipeline once on a tiny image.
+
+    The first real request then pays neither the imports nor the numba
+    compilation of the Crimmins kernel.
+    """
+    import batch
+    import parallel
+    parallel.init_worker()
+    tiny = np.random.default_rng(0).integers(0, 256, (16, 16), dtype=np.uint8)
+    for pipeline in batch.PIPELINES.values():
+        pipeline(tiny)
+
+def _decode(data):
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise BadRequest("Could not decode the image")
+    return img
+
+def _encode_outputs(outputs, output):
+    """One output as PNG when named, otherwise all of them as an uncompressed .npz."""
+    if output is not None:
+        if output not in outputs:
+            raise BadRequest(f"Unknown output {output!r}, expected one of {sorted(outputs)}")
+        return "image/png", cv2.imencode(".png", outputs[output])[1].tobytes()
+    buffer = io.BytesIO()
+    np.savez(buffer, **outputs)
+    return "application/octet-stream", buffer.getvalue()
+
+def _volume(path):
+    from dicom_volume import DicomVolume
+    key = (path, os.stat(path).st_mtime_ns)
+    volume = _volumes.pop(key, None) or DicomVolume(path)
+    _volumes[key] = volume
+    while len(_volumes) > VOLUME_CACHE_SIZE:
+        _volumes.popitem(last=False)
+    return volume
+
+def run_pipeline(pipeline, data, path, output, deadline):
+    """Worker entry point for the image pipelines; returns (content type, body)."""
+    import batch
+    if time.time() > deadline:
+        raise DeadlineExceeded("Deadline passed while queued")
+    if path is not None:
+        import image_io
+        try:
+            img = image_io.read_image(path)
+        except OSError as exc:
+            raise BadRequest(str(exc))
+    else:
+        img = _decode(data)
+    return _encode_outputs(batch.PIPELINES[pipeline](img), output)
+
+def run_dicom_slice(path, index, deadline):
+    """Worker entry point for DICOM slice extraction: one frame as an 8-bit PNG."""
+    if time.time() > deadline:
+        raise DeadlineExceeded("Deadline passed while queued")
+    volume = _volume(path)
+    if not 0 <= index < len(volume):
+        raise BadRequest(f"Slice {index} out of range 0..{len(volume) - 1}")
+    frame = np.rint(volume.frame(index) * 255).astype(np.uint8)
+    return "image/png", cv2.imencode(".png", frame)[1].tobytes()
+
+# ---------------------------------------------------------------- server side
+
+class ProcessingService:
+    """Warm process pool behind a bounded request queue.
+
+    At most max_pending requests are queued or running; further requests
+    are rejected at once (HTTP 503) instead of piling up. Every request has
+    a deadline: workers skip requests whose deadline passed while queued,
+    and the caller stops waiting when it is reached (HTTP 504).
+    """
+
+    def __init__(self, workers=None, max_pending=None, root="."):
+        self.workers = workers or os.cpu_count()
+        self.max_pending = max_pending or 4 * self.workers
+        self.root = os.path.realpath(root)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.counters = {"completed": 0, "rejected": 0, "timed_out": 0, "failed": 0}
+        self.pending = 0
+        import parallel
+        self.pool = parallel.make_pool(self.workers, initializer=_warm_worker)
+
+    def warm_up(self):
+        """Start every worker now and wait until each has run its warm-up."""
+        futures = [self.pool.submit(time.sleep, 0.05) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def resolve(self, path):
+        """Absolute path of a file under the service root; other paths are refused."""
+        path = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise BadRequest("Path outside the service root")
+        if not os.path.isfile(path):
+            raise BadRequest(f"No such file: {path}")
+        return path
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def call(self, func, *args, deadline):
+        """Run func(*args, deadline) on the pool; raises OverflowError when the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise OverflowError("Too many pending requests")
+        with self._lock:
+            self.pending += 1
+        future = self.pool.submit(func, *args, deadline)
+
+        def release(_):
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+
+        future.add_done_callback(release)
+        try:
+            result = future.result(timeout=max(0.0, deadline - time.time()))
+        except (FutureTimeout, DeadlineExceeded):
+            future.cancel()
+            self._count("timed_out")
+            raise DeadlineExceeded("Deadline exceeded")
+        self._count("completed")
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=self.pending, workers=self.workers,
+                        max_pending=self.max_pending)
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """HTTP front end.
+
+    POST /<pipeline>                      any batch.PIPELINES name, e.g. /speckle or /auto;
+                                          body = encoded image, or ?path=FILE
+        -> .npz of every output, or one PNG with ?output=NAME
+    GET  /dicom/slice?path=FILE&index=N   -> PNG of the normalized slice
+    GET  /health                          -> JSON counters
+    A deadline can be set per request with ?deadline_ms= or an X-Deadline-Ms header.
+    """
+
+    protocol_version = "HTTP/1.1"
+    service = None
+    quiet = True
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _reply(self, status, content_type, body, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, headers=()):
+        self._reply(status, "application/json", json.dumps({"error": message}).encode(), headers)
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = b""
+        if method == "POST":
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        deadline_ms = float(query.get("deadline_ms", self.headers.get("X-Deadline-Ms", DEFAULT_DEADLINE_MS)))
+        deadline = time.time() + deadline_ms / 1000
+        service = self.service
+        import batch
+
+        if method == "GET" and url.path == "/health":
+            return "application/json", json.dumps(service.stats()).encode()
+        if method == "POST" and url.path.strip("/") in batch.PIPELINES:
+            path = service.resolve(query["path"]) if "path" in query else None
+            if path is None and not body:
+                raise BadRequest("Send the image as the request body or pass ?path=")
+            return service.call(run_pipeline, url.path.strip("/"), body, path, query.get("output"),
+                                deadline=deadline)
+        if method == "GET" and url.path == "/dicom/slice":
+            if "path" not in query:
+                raise BadRequest("Pass ?path= to a DICOM file")
+            return service.call(run_dicom_slice, service.resolve(query["path"]), int(query.get("index", 0)),
+                                deadline=deadline)
+        raise NotFound(f"Unknown endpoint {method} {url.path}")
+
+    def _handle(self, method):
+        try:
+            content_type, body = self._dispatch(method)
+        except NotFound as exc:
+            self._error(404, str(exc))
+        except (BadRequest, ValueError) as exc:
+            self.service._count("failed")
+            self._error(400, str(exc))
+        except OverflowError as exc:
+            self._error(503, str(exc), [("Retry-After", "1")])
+        except DeadlineExceeded as exc:
+            self._error(504, str(exc))
+        except Exception as exc:
+            self.service._count("failed")
+            self._error(500, f"{type(exc).__name__}: {exc}")
+        else:
+            self._reply(200, content_type, body)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        self.socket.bind(self.server_address)
+        self.server_name, self.server_port = "localhost", 0
+
+def make_server(service, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None, quiet=True):
+    """HTTP server bound to host:port, or to a Unix socket path when given."""
+    handler = type("Handler", (ServiceHandler,), {"service": service, "quiet": quiet})
+    if unix_socket:
+        server = UnixHTTPServer(unix_socket, handler)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident image processing service with warm worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (0 = all cores)")
+    parser.add_argument("--max-pending", type=int, help="Queued + running requests before 503 (default 4 per worker)")
+    parser.add_argument("--root", default=".", help="Directory that ?path= arguments are resolved against")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    # Shut the pool down cleanly on SIGTERM as well as Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    service = ProcessingService(args.workers or None, args.max_pending, args.root)
+    start = time.perf_counter()
+    service.warm_up()
+    server = make_server(service, args.host, args.port, args.socket, quiet=not args.verbose)
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"{service.workers} workers warm in {time.perf_counter() - start:.1f}s, listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    main()
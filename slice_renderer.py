@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict, deque
+import numpy as np
+
+# Frame latencies kept for latency_report(); older ones are dropped
+LATENCY_WINDOW = 4096
+
+class SliceRenderer:
+    """Colormapped RGBA frames for a DicomVolume with an LRU cache and prefetching.
+
+    Frames are mapped through a 256 entry uint8 lookup table once and then
+    handed to matplotlib as RGBA, so redraws skip colormapping entirely.
+    A background thread renders the slices ahead of the current one in the
+    direction the user is scrolling.
+    """
+
+    def __init__(self, volume, cmap="inferno", vmin=None, vmax=None, cache_size=64, prefetch=8):
+        from matplotlib import colormaps
+
+        self.volume = volume
+        self.lut = colormaps[cmap](np.linspace(0, 1, 256), bytes=True)
+        volume.value_range()  # Compute normalization before any thread reads frames
+        if vmin is None or vmax is None:
+            # Same scaling imshow picks when it autoscales on the first slice
+            first = volume.frame(0)
+            vmin = float(first.min()) if vmin is None else vmin
+            vmax = float(first.max()) if vmax is None else vmax
+        self.vmin, self.vmax = vmin, vmax
+        self.cache_size = cache_size
+        self.prefetch = prefetch
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._wanted = []
+        self._wake = threading.Condition(self._lock)
+        self._last_index = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._prefetch_loop, daemon=True)
+        self._thread.start()
+
+    def render(self, index):
+        """Colormap one slice to an (rows, columns, 4) uint8 array, bypassing the cache."""
+        frame = self.volume.frame(index)
+        scale = 256.0 / ((self.vmax - self.vmin) or 1.0)
+        indices = (frame - self.vmin) * scale
+        np.clip(indices, 0, 255, out=indices)
+        return self.lut[indices.astype(np.uint8)]
+
+    def _store(self, index, rgba):
+        self._cache[index] = rgba
+        self._cache.move_to_end(index)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get(self, index):
+        """RGBA frame for a slice, from the cache when possible; schedules prefetching."""
+        start = time.perf_counter()
+        with self._lock:
+            rgba = self._cache.get(index)
+            if rgba is not None:
+                self._cache.move_to_end(index)
+        if rgba is None:
+            rgba = self.render(index)
+            with self._lock:
+                self._store(index, rgba)
+        self.latencies.append(time.perf_counter() - start)
+        self._schedule(index)
+        return rgba
+
+    def _schedule(self, index):
+        """Queue the next slices in the current scroll direction, replacing older requests."""
+        direction = 1
+        if self._last_index is not None and index < self._last_index:
+            direction = -1
+        self._last_index = index
+        ahead = [index + direction * step for step in range(1, self.prefetch + 1)]
+        with self._wake:
+            self._wanted = [i for i in ahead if 0 <= i < len(self.volume) and i not in self._cache]
+            self._wake.notify()
+
+    def _prefetch_loop(self):
+        while True:
+            with self._wake:
+                while not self._wanted and not self._closed:
+                    self._wake.wait()
+                if self._closed:
+                    return
+                index = self._wanted.pop(0)
+                if index in self._cache:
+                    continue
+            rgba = self.render(index)
+            with self._lock:
+                self._store(index, rgba)
+
+    def close(self):
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+        self._thread.join()
+
+    def latency_report(self):
+        """p50/p90/p99/max frame latency in milliseconds over the last LATENCY_WINDOW get() calls."""
+        if not self.latencies:
+            return {}
+        ms = np.array(self.latencies) * 1000
+        return {
+            "frames": len(ms),
+            "p50": float(np.percentile(ms, 50)),
+            "p90": float(np.percentile(ms, 90)),
+            "p99": float(np.percentile(ms, 99)),
+            "max": float(ms.max()),
+        }
@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+import morphology
+from crimmins import HAVE_NUMBA, CrimminsWorkspace, crimmins_speckle_removal
+
+# Images per stack; bounds memory when a bucket holds many images
+DEFAULT_MAX_STACK = 64
+
+# Pixels per vectorized Crimmins call; keeps the work buffers cache-sized
+# while still amortizing the per-call overhead over many tiny images
+CHUNK_PIXELS = 2**16
+
+class ImageStack:
+    """Images of one shape stored as a single (N, H, W) uint8 array.
+
+    The stack functions below take an (N, H, W) array, such as data or an
+    earlier step's output, and give every image exactly the result it would
+    get on its own.
+    """
+
+    def __init__(self, names, data):
+        self.names = list(names)
+        self.data = data
+
+    def __len__(self):
+        return len(self.names)
+
+    def unstack(self, data=None):
+        """(name, image) pairs."""
+        data = self.data if data is None else data
+        return list(zip(self.names, data))
+
+def _make_stack(members):
+    return ImageStack([name for name, _ in members], np.stack([img for _, img in members]))
+
+def bucket_images(images, max_stack=DEFAULT_MAX_STACK):
+    """Group (name, img) pairs into ImageStacks of identical shape.
+
+    Images are not padded to share a stack: the masking that padding needs
+    cost more than the stacking saved. A stack is yielded as soon as it
+    holds max_stack images, so images can be streamed in.
+    """
+    buckets = {}
+    for name, img in images:
+        shape = img.shape[:2]
+        members = buckets.setdefault(shape, [])
+        members.append((name, img))
+        if len(members) == max_stack:
+            yield _make_stack(members)
+            del buckets[shape]
+    for members in buckets.values():
+        yield _make_stack(members)
+
+def preprocess_stack(data):
+    """task_1_blurring.preprocess_image for every image: invert the ones with a white background."""
+    means = data.sum(axis=(1, 2), dtype=np.int64) / (data.shape[1] * data.shape[2])
+    out = data.copy()
+    out[means > 127] = ~out[means > 127]
+    return out
+
+def crimmins_stack(data, iterations=3, backend="auto"):
+    """Crimmins filter over a whole stack.
+
+    The numpy backend filters the stack in vectorized chunks of images; the
+    compiled numba kernel (picked by "auto" when installed) is already fast
+    per image, so it and the other backends loop over the images.
+    """
+    if backend == "auto":
+        backend = "numba" if HAVE_NUMBA else "numpy"
+    out = np.zeros_like(data)
+    if backend == "numpy":
+        # Chunks of a few images keep the int16 work buffers in cache
+        chunk = max(1, CHUNK_PIXELS // (data.shape[1] * data.shape[2]))
+        workspace = CrimminsWorkspace((chunk,) + data.shape[1:])
+        for start in range(0, len(data), chunk):
+            part = slice(start, start + chunk)
+            if len(data[part]) != chunk:
+                workspace = CrimminsWorkspace(data[part].shape)
+            workspace.run(data[part], iterations, out=out[part])
+        return out
+    for i, img in enumerate(data):
+        out[i] = crimmins_speckle_removal(img, iterations, backend)
+    return out
+
+def opening_stack(data, kernel_size, backend="auto"):
+    """Opening with a square kernel on every image."""
+    return morphology.opening(data, morphology.square(kernel_size), backend)
+
+def closing_stack(data, kernel_size, backend="auto"):
+    """Closing with a square kernel on every image."""
+    return morphology.closing(data, morphology.square(kernel_size), backend)
+
+def difference_stack(original, processed):
+    """task_2_speckle.calculate_difference_image for every image of the stack."""
+    # Element-wise OpenCV calls see the stack as one tall 2-D image
+    width = original.shape[-1]
+    diff = cv2.absdiff(original.reshape(-1, width), processed.reshape(-1, width)).reshape(original.shape)
+    low = diff.min(axis=(1, 2))
+    high = diff.max(axis=(1, 2))
+    # Same min-max scaling as cv2.normalize(..., NORM_MINMAX, CV_8U): float32
+    # scale and shift applied with a single (fused multiply-add) rounding.
+    # diff only takes values 0..255, so each image gets a 256 entry table.
+    low = low.astype(np.float64)
+    span = high - low
+    scale = np.divide(255.0, span, out=np.zeros_like(span), where=span > 0)
+    shift = -low * scale
+    scale = scale.astype(np.float32).astype(np.float64)[:, None]
+    shift = shift.astype(np.float32).astype(np.float64)[:, None]
+    table = (np.arange(256) * scale + shift).astype(np.float32)
+    table = np.clip(np.rint(table), 0, 255).astype(np.uint8)
+    return np.stack([cv2.LUT(layer, lut) for layer, lut in zip(diff, table)])
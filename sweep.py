@@ -0,0 +1,127 @@
+import argparse
+import csv
+import itertools
+import json
+import time
+import image_io
+import task_1_blurring
+import task_2_speckle as speckle
+from metrics import Reference
+
+# Single stage operations. A pipeline is a tuple of steps (op, *params), and
+# each step is applied to the output of the steps before it.
+OPS = {
+    "preprocess": task_1_blurring.preprocess_image,
+    "blur": task_1_blurring.apply_blur,
+    "median": speckle.apply_median_filter,
+    "bilateral": speckle.apply_bilateral_filter,
+    "crimmins_iteration": lambda img: speckle.apply_crimmins_speckle_removal(img, iterations=1),
+    "opening": speckle.apply_opening,
+    "closing": speckle.apply_closing,
+}
+
+# Filter name -> function of the filter's parameters returning its step tuple.
+# Crimmins with n iterations is n single-iteration steps, so iteration n
+# starts from the cached result of iteration n - 1.
+FILTERS = {
+    "median": lambda kernel_size: (("median", kernel_size),),
+    "bilateral": lambda d, sigma_color, sigma_space: (("bilateral", d, sigma_color, sigma_space),),
+    "crimmins": lambda iterations: (("crimmins_iteration",),) * iterations,
+    "mymethod": lambda crimmins_iterations, opening_kernel_size, closing_kernel_size: (
+        (("crimmins_iteration",),) * crimmins_iterations
+        + (("opening", opening_kernel_size), ("closing", closing_kernel_size))),
+    "blur_closing": lambda kernel_size: (("preprocess",), ("blur",), ("closing", kernel_size)),
+}
+
+DEFAULT_GRID = {
+    "median": {"kernel_size": [3, 5, 7]},
+    "bilateral": {"d": [9, 15], "sigma_color": [50, 75], "sigma_space": [15]},
+    "crimmins": {"iterations": [1, 2, 3, 4, 5]},
+    "mymethod": {"crimmins_iterations": [1, 3, 5], "opening_kernel_size": [3, 5],
+                 "closing_kernel_size": [3, 5]},
+    "blur_closing": {"kernel_size": [2, 3, 4, 5]},
+}
+
+class StageCache:
+    """Memoized stage DAG for one image: every step prefix is computed once."""
+
+    def __init__(self, img):
+        self.img = img
+        self.outputs = {(): img}
+        self.seconds = {(): 0.0}
+
+    def compute(self, steps):
+        """Output of a step tuple, computing only the missing suffix."""
+        steps = tuple(steps)
+        if steps not in self.outputs:
+            parent = self.compute(steps[:-1])
+            op, *params = steps[-1]
+            start = time.perf_counter()
+            self.outputs[steps] = OPS[op](parent, *params)
+            self.seconds[steps] = time.perf_counter() - start
+        return self.outputs[steps]
+
+    def standalone_seconds(self, steps):
+        """What the steps would cost without any sharing."""
+        return sum(self.seconds[steps[:i]] for i in range(1, len(steps) + 1))
+
+def expand_grid(grid):
+    """Yield (filter, params) for every point of every filter's grid."""
+    for name, space in grid.items():
+        keys = list(space)
+        for values in itertools.product(*(space[k] for k in keys)):
+            yield name, dict(zip(keys, values))
+
+def run_sweep(images, grid):
+    """Evaluate every grid point on every (name, image) and return one record per pair."""
+    records = []
+    points = [(name, params, FILTERS[name](**params)) for name, params in expand_grid(grid)]
+    if images:  # Compile the numba Crimmins kernel before anything is timed
+        OPS["crimmins_iteration"](images[0][1][:8, :8])
+    for image_name, img in images:
+        cache = StageCache(img)
+        reference = Reference(img)  # Input-only SSIM terms, shared by every configuration
+        for name, params, steps in points:
+            result = cache.compute(steps)
+            records.append({
+                "image": image_name,
+                "filter": name,
+                "params": json.dumps(params, sort_keys=True),
+                "psnr_vs_input": reference.psnr(result),
+                "ssim_vs_input": reference.ssim(result),
+                "standalone_seconds": cache.standalone_seconds(steps),
+            })
+        shared = sum(cache.seconds.values())
+        standalone = sum(r["standalone_seconds"] for r in records if r["image"] == image_name)
+        print(f"{image_name}: {len(points)} configurations, {len(cache.outputs) - 1} stages computed, "
+              f"{shared:.2f}s instead of {standalone:.2f}s")
+    return records
+
+def write_table(records, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[0]))
+        writer.writeheader()
+        writer.writerows(records)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep filter parameters over a folder of images.")
+    parser.add_argument("folder", help="Folder of images, e.g. noisy/speckle")
+    parser.add_argument("--grid", help="JSON file mapping filter -> parameter -> list of values")
+    parser.add_argument("--filters", nargs="+", choices=sorted(FILTERS), help="Subset of the grid to run")
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    if args.filters:
+        grid = {name: space for name, space in grid.items() if name in args.filters}
+
+    images = image_io.load_images(args.folder, image_io.list_images(args.folder))
+    records = run_sweep(images, grid)
+    write_table(records, args.output)
+    print(f"{len(records)} results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
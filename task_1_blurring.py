@@ -1,56 +1,74 @@
+import argparse
 import os
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
-from skimage import morphology
+import composite
+import image_io
+import morphology
+import profiling
+from results import PipelineResult
 
 def load_images(folder, sample_size=3):
     """Load 3 random images from a folder."""
-    files = [f for f in os.listdir(folder) if f.endswith(('png', 'jpg', 'jpeg'))]
-    selected_files = np.random.choice(files, sample_size, replace=False)
-    return [(f, cv2.imread(os.path.join(folder, f), cv2.IMREAD_GRAYSCALE)) for f in selected_files]
+    selected_files = np.random.choice(image_io.list_images(folder), sample_size, replace=False)
+    return image_io.load_images(folder, selected_files)
 
+@profiling.profiled("preprocess")
 def preprocess_image(img):
     """Ensure foreground is white and background is black."""
     if np.mean(img) > 127:  # If background is white, invert it
         img = cv2.bitwise_not(img)
     return img
 
+@profiling.profiled("blur")
 def apply_blur(img):
     """Apply Gaussian blur to reduce noise before closing."""
     return cv2.GaussianBlur(img, (3, 3), 0)
 
+@profiling.profiled("closing")
 def apply_closing(img, kernel_size):
     return morphology.closing(img, morphology.square(kernel_size))
 
-def save_processed_images(filename, img, output_folder):
-    """Save the processed images after closing."""
+def process_image(img):
+    """Run the blur + closing pipeline and return the titled steps."""
     img = preprocess_image(img)  # Ensure correct foreground/background
     blurred = apply_blur(img)  # Apply blurring before closing
     closing_k2 = apply_closing(blurred, 2)
     closing_k3 = apply_closing(blurred, 3)
-    
-    # Prepare the figure
+    return [("Original", img), ("Closing K=2", closing_k2), ("Closing K=3", closing_k3)]
+
+@profiling.profiled("figure_render")
+def plot_result(result):
+    """Build the comparison figure for a processed image."""
+    import matplotlib.pyplot as plt
     fig, axes = plt.subplots(1, 3, figsize=(12, 5))
-    images = [("Original", img), ("Closing K=2", closing_k2), ("Closing K=3", closing_k3)]
     
-    for ax, (title, image) in zip(axes, images):
+    for ax, (title, image) in zip(axes, result):
         ax.imshow(image, cmap='gray')
         ax.set_title(title)
         ax.axis("off")
     
-    plt.suptitle(f"Image: {filename}", fontsize=12)
-    
-    # Save the figure to the specified folder
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    
-    output_path = os.path.join(output_folder, f"{filename}_processed.png")
-    plt.savefig(output_path)
-    plt.close(fig)
+    plt.suptitle(f"Image: {result.filename}", fontsize=12)
+    return fig
+
+def save_processed_images(result, output_folder, figure=None, fig=None, composites=None):
+    """Write the processed arrays directly, plus the comparison as a cv2 mosaic or the matplotlib fig.
 
-def on_image_click(event, images, fig, output_folder):
+    Mosaics are queued on composites, a composite.CompositeWriter, so the
+    window closes without waiting for the encode.
+    """
+    result.save_images(output_folder)
+    path = os.path.join(output_folder, f"{result.filename}_processed.png")
+    if figure == "mosaic":
+        composites.submit(path, [list(result)], f"Image: {result.filename}", image=result.filename)
+    elif figure == "matplotlib":
+        os.makedirs(output_folder, exist_ok=True)
+        with profiling.stage("savefig"):
+            fig.savefig(path)
+
+def on_image_click(event, images, fig, output_folder, save_figure=None, composites=None):
     """Identify the clicked image and process it."""
+    import matplotlib.pyplot as plt
     if event.xdata is not None and event.ydata is not None:
         num_images = len(images)
         fig_width = fig.get_size_inches()[0] * fig.dpi  
@@ -61,36 +79,27 @@ def on_image_click(event, images, fig, output_folder):
         if 0 <= index < num_images:
             filename, img = images[index]
             plt.close(fig)
-            show_processed_images(filename, img, output_folder)
+            show_processed_images(filename, img, output_folder, save_figure, composites)
 
-def show_processed_images(filename, img, output_folder):
+def show_processed_images(filename, img, output_folder, save_figure=None, composites=None):
     """Show processed images and save after closing."""
-    img = preprocess_image(img)  # Ensure correct foreground/background
-    blurred = apply_blur(img)  # Apply blurring before closing
-    closing_k2 = apply_closing(blurred, 2)
-    closing_k3 = apply_closing(blurred, 3)
-    
-    # Prepare the figure
-    fig, axes = plt.subplots(1, 3, figsize=(12, 5))
-    images = [("Original", img), ("Closing K=2", closing_k2), ("Closing K=3", closing_k3)]
-    
-    for ax, (title, image) in zip(axes, images):
-        ax.imshow(image, cmap='gray')
-        ax.set_title(title)
-        ax.axis("off")
-    
-    plt.suptitle(f"Image: {filename}", fontsize=12)
+    import matplotlib.pyplot as plt
+    with profiling.image(filename):
+        result = PipelineResult(filename, process_image(img))  # Computed once for display and save
+        fig = plot_result(result)
     
     # Connect the close event to save the image once the window is closed
     def on_close(event):
-        save_processed_images(filename, img, output_folder)
+        with profiling.image(filename):
+            save_processed_images(result, output_folder, save_figure, fig, composites)
     
     fig.canvas.mpl_connect('close_event', on_close)
     
     plt.show()
 
-def show_initial_selection(images, output_folder):
+def show_initial_selection(images, output_folder, save_figure=None, composites=None):
     """Display initial selection window with 3 random images side by side."""
+    import matplotlib.pyplot as plt
     fig, axes = plt.subplots(1, len(images), figsize=(9, 4))  
 
     for i, (filename, img) in enumerate(images):
@@ -99,13 +108,25 @@ def show_initial_selection(images, output_folder):
         axes[i].axis("off")
 
     plt.figtext(0.5, 0.01, "Click on an image to proceed", ha="center", fontsize=10)
-    fig.canvas.mpl_connect('button_press_event', lambda event: on_image_click(event, images, fig, output_folder))
+    fig.canvas.mpl_connect('button_press_event', lambda event: on_image_click(event, images, fig, output_folder, save_figure, composites))
     plt.show()
 
 def main():
+    parser = argparse.ArgumentParser(description="Blur and closing on noisy chemical images.")
+    parser.add_argument("--figure", nargs="?", const="mosaic", choices=["mosaic", "matplotlib"],
+                        help="Also save the comparison: a fast cv2 mosaic (default) or the matplotlib figure")
+    parser.add_argument("--profile", metavar="DIR", help="Write stage traces and a summary to DIR on exit")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable()
     images = load_images("noisy/chemical")
     output_folder = "output_task_1"
-    show_initial_selection(images, output_folder)
+    with composite.CompositeWriter() as composites:  # Closing waits for the queued mosaics
+        show_initial_selection(images, output_folder, args.figure, composites)
+    if args.profile:
+        profiler = profiling.disable()
+        profiler.write(args.profile)
+        profiler.print_summary()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
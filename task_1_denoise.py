@@ -1,17 +1,22 @@
+import argparse
 import os
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
-from skimage.morphology import white_tophat, disk, closing, square
+import composite
+import image_io
+from morphology import white_tophat, disk, closing, square
+import nlm
+import profiling
+from results import PipelineResult
 
 def load_images(folder, sample_size=3):
-    files = [f for f in os.listdir(folder) if f.endswith(('png', 'jpg', 'jpeg'))]
-    selected_files = np.random.choice(files, sample_size, replace=False)
-    return [(f, cv2.imread(os.path.join(folder, f), cv2.IMREAD_GRAYSCALE)) for f in selected_files]
+    selected_files = np.random.choice(image_io.list_images(folder), sample_size, replace=False)
+    return image_io.load_images(folder, selected_files)
 
-def denoise_image(img):
-    return cv2.fastNlMeansDenoising(img, None, 30, 7, 21)
+def denoise_image(img, mode="exact", h=nlm.DEFAULT_H):
+    return nlm.denoise(img, h, 7, 21, mode=mode)
 
+@profiling.profiled("sobel")
 def enhance_lines(img):
     """Enhance lines using the best chosen method."""
     inverted = cv2.bitwise_not(img)  
@@ -29,14 +34,16 @@ def enhance_lines(img):
     
     return sobel_edges
 
+@profiling.profiled("closing")
 def enhance_lines_closing(img):
     """Enhance lines using morphological closing."""
     inverted = cv2.bitwise_not(img)
     closed = closing(inverted, square(3))
     return cv2.bitwise_not(closed)
 
-def process_image(img):
-    denoised = denoise_image(img)
+def process_image(img, denoised=None):
+    if denoised is None:
+        denoised = denoise_image(img)
     enhanced_edge = enhance_lines(denoised)
     enhanced_closing = enhance_lines_closing(denoised)
     return [
@@ -46,27 +53,37 @@ def process_image(img):
         ("Enhanced (Edge detection)", enhanced_edge)
     ]
 
-def save_processed_images(filename, img, output_folder):
-    """Save the figure to the specified folder"""
-    steps = process_image(img)
-    
+@profiling.profiled("figure_render")
+def plot_result(result):
+    """Build the comparison figure for a processed image."""
+    import matplotlib.pyplot as plt
     fig, axes = plt.subplots(1, 4, figsize=(16, 5))
     
-    for i, (title, image) in enumerate(steps):
+    for i, (title, image) in enumerate(result):
         axes[i].imshow(image, cmap='gray')
         axes[i].set_title(title)
         axes[i].axis("off")
     
-    plt.suptitle(f"Processing Steps: {filename}")
-    
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    
-    output_path = os.path.join(output_folder, f"{filename}_processed.png")
-    plt.savefig(output_path)
-    plt.close(fig)
+    plt.suptitle(f"Processing Steps: {result.filename}")
+    return fig
 
-def on_image_click(event, images, fig, output_folder):
+def save_processed_images(result, output_folder, figure=None, fig=None, composites=None):
+    """Write the processed arrays directly, plus the comparison as a cv2 mosaic or the matplotlib fig.
+
+    Mosaics are queued on composites, a composite.CompositeWriter, so the
+    window closes without waiting for the encode.
+    """
+    result.save_images(output_folder)
+    path = os.path.join(output_folder, f"{result.filename}_processed.png")
+    if figure == "mosaic":
+        composites.submit(path, [list(result)], f"Processing Steps: {result.filename}", image=result.filename)
+    elif figure == "matplotlib":
+        os.makedirs(output_folder, exist_ok=True)
+        with profiling.stage("savefig"):
+            fig.savefig(path)
+
+def on_image_click(event, images, fig, output_folder, save_figure=None, composites=None):
+    import matplotlib.pyplot as plt
     if event.xdata is not None and event.ydata is not None:
         num_images = len(images)
         fig_width = fig.get_size_inches()[0] * fig.dpi
@@ -76,28 +93,24 @@ def on_image_click(event, images, fig, output_folder):
         if 0 <= index < num_images:
             filename, img = images[index]
             plt.close(fig)
-            show_processed_images(filename, img, output_folder)
+            show_processed_images(filename, img, output_folder, save_figure, composites)
 
-def show_processed_images(filename, img, output_folder):
-    steps = process_image(img)
-    
-    fig, axes = plt.subplots(1, 4, figsize=(16, 5))
-    
-    for i, (title, image) in enumerate(steps):
-        axes[i].imshow(image, cmap='gray')
-        axes[i].set_title(title)
-        axes[i].axis("off")
-    
-    plt.suptitle(f"Processing Steps: {filename}")
+def show_processed_images(filename, img, output_folder, save_figure=None, composites=None):
+    import matplotlib.pyplot as plt
+    with profiling.image(filename):
+        result = PipelineResult(filename, process_image(img))  # NLM runs once for display and save
+        fig = plot_result(result)
     
     def on_close(event):
-        save_processed_images(filename, img, output_folder)
+        with profiling.image(filename):
+            save_processed_images(result, output_folder, save_figure, fig, composites)
     
     fig.canvas.mpl_connect('close_event', on_close)
     
     plt.show()
 
-def show_initial_selection(images, output_folder):
+def show_initial_selection(images, output_folder, save_figure=None, composites=None):
+    import matplotlib.pyplot as plt
     fig, axes = plt.subplots(1, len(images), figsize=(9, 4))
     
     for i, (filename, img) in enumerate(images):
@@ -106,13 +119,28 @@ def show_initial_selection(images, output_folder):
         axes[i].axis("off")
     
     plt.figtext(0.5, 0.01, "Click on an image to proceed", ha="center", fontsize=10)
-    fig.canvas.mpl_connect('button_press_event', lambda event: on_image_click(event, images, fig, output_folder))
+    fig.canvas.mpl_connect('button_press_event', lambda event: on_image_click(event, images, fig, output_folder, save_figure, composites))
     plt.show()
 
 def main():
+    parser = argparse.ArgumentParser(description="NLM denoising and line enhancement on noisy chemical images.")
+    parser.add_argument("--figure", nargs="?", const="mosaic", choices=["mosaic", "matplotlib"],
+                        help="Also save the comparison: a fast cv2 mosaic (default) or the matplotlib figure")
+    parser.add_argument("--profile", metavar="DIR", help="Write stage traces and a summary to DIR on exit")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse denoised images from nlm_cache/")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable()
+    if not args.no_cache:
+        nlm.set_default_cache(nlm.DenoiseCache("nlm_cache"))
     images = load_images("noisy/chemical")
     output_folder = "output_task_1"
-    show_initial_selection(images, output_folder)
+    with composite.CompositeWriter() as composites:  # Closing waits for the queued mosaics
+        show_initial_selection(images, output_folder, args.figure, composites)
+    if args.profile:
+        profiler = profiling.disable()
+        profiler.write(args.profile)
+        profiler.print_summary()
 
 if __name__ == "__main__":
     main()
@@ -1,133 +1,48 @@
+import argparse
 import os
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
-from skimage import morphology  # For morphological operations
+import composite
+import image_io
+import metrics
+import profiling
+import morphology  # For morphological operations
+from crimmins import crimmins_speckle_removal
 
 def load_images(folder, sample_size=3):
     """Load a specified number of random images from a folder."""
-    files = [f for f in os.listdir(folder) if f.endswith(('png', 'jpg', 'jpeg'))]
-    selected_files = np.random.choice(files, sample_size, replace=False)
-    return [(f, cv2.imread(os.path.join(folder, f), cv2.IMREAD_GRAYSCALE)) for f in selected_files]
+    selected_files = np.random.choice(image_io.list_images(folder), sample_size, replace=False)
+    return image_io.load_images(folder, selected_files)
 
+@profiling.profiled("preprocess")
 def preprocess_image(img):
     """No preprocessing needed for speckle in most cases."""
     return img
 
+@profiling.profiled("median")
 def apply_median_filter(img, kernel_size):
     """Applies a median filter to the image."""
     return cv2.medianBlur(img, kernel_size)
 
+@profiling.profiled("bilateral")
 def apply_bilateral_filter(img, kernel_size, sigma_color, sigma_space):
     """Applies a bilateral filter to the image."""
     return cv2.bilateralFilter(img, kernel_size, sigma_color, sigma_space)
 
-def apply_crimmins_speckle_removal(img, iterations=3):
+@profiling.profiled("crimmins")
+def apply_crimmins_speckle_removal(img, iterations=3, backend="auto"):
     """Applies the Crimmins speckle removal algorithm."""
+    return crimmins_speckle_removal(img, iterations=iterations, backend=backend)
 
-    def adjust_dark_pixels(img):
-        """Adjusts dark pixels based on neighboring pixels."""
-        a = img.astype(np.int16)
-        b = a.copy()
-        height, width = img.shape[:2]  # Handle grayscale images
-
-        # N-S direction
-        c = np.roll(a, -1, axis=0)
-        c[0, :] = a[0, :]  # Handle top boundary
-        d = np.roll(a, 1, axis=0)
-        d[height - 1, :] = a[height - 1, :]  # Handle bottom boundary
-        mask = (a < np.minimum(c, d)) & (c != d)
-        b[mask] += np.sign(c[mask] - d[mask])
-
-        # E-W direction
-        c = np.roll(a, -1, axis=1)
-        c[:, 0] = a[:, 0]  # Handle left boundary
-        d = np.roll(a, 1, axis=1)
-        d[:, width - 1] = a[:, width - 1]  # Handle right boundary
-        mask = (a < np.minimum(c, d)) & (c != d)
-        b[mask] += np.sign(c[mask] - d[mask])
-
-        # NW-SE direction
-        c = np.roll(np.roll(a, -1, axis=0), -1, axis=1)
-        c[0, :] = a[0, :]
-        c[:, 0] = a[:, 0]
-        d = np.roll(np.roll(a, 1, axis=0), 1, axis=1)
-        d[height - 1, :] = a[height - 1, :]
-        d[:, width - 1] = a[:, width - 1]
-        mask = (a < np.minimum(c, d)) & (c != d)
-        b[mask] += np.sign(c[mask] - d[mask])
-
-        # NE-SW direction
-        c = np.roll(np.roll(a, -1, axis=0), 1, axis=1)
-        c[0, :] = a[0, :]
-        c[:, width - 1] = a[:, width - 1]
-        d = np.roll(np.roll(a, 1, axis=0), -1, axis=1)
-        d[height - 1, :] = a[height - 1, :]
-        d[:, 0] = a[:, 0]
-        mask = (a < np.minimum(c, d)) & (c != d)
-        b[mask] += np.sign(c[mask] - d[mask])
-
-        return b.astype(np.uint8)
-
-    def adjust_light_pixels(img):
-        """Adjusts light pixels based on neighboring pixels."""
-        a = img.astype(np.int16)
-        b = a.copy()
-        height, width = img.shape[:2]
-
-        # N-S direction
-        c = np.roll(a, -1, axis=0)
-        c[0, :] = a[0, :]
-        d = np.roll(a, 1, axis=0)
-        d[height - 1, :] = a[height - 1, :]
-        mask = (a > np.maximum(c, d)) & (c != d)
-        b[mask] -= np.sign(c[mask] - d[mask])
-
-        # E-W direction
-        c = np.roll(a, -1, axis=1)
-        c[:, 0] = a[:, 0]
-        d = np.roll(a, 1, axis=1)
-        d[:, width - 1] = a[:, width - 1]
-        mask = (a > np.maximum(c, d)) & (c != d)
-        b[mask] -= np.sign(c[mask] - d[mask])
-
-        # NW-SE direction
-        c = np.roll(np.roll(a, -1, axis=0), -1, axis=1)
-        c[0, :] = a[0, :]
-        c[:, 0] = a[:, 0]
-        d = np.roll(np.roll(a, 1, axis=0), 1, axis=1)
-        d[height - 1, :] = a[height - 1, :]
-        d[:, width - 1] = a[:, width - 1]
-        mask = (a > np.maximum(c, d)) & (c != d)
-        b[mask] -= np.sign(c[mask] - d[mask])
-
-        # NE-SW direction
-        c = np.roll(np.roll(a, -1, axis=0), 1, axis=1)
-        c[0, :] = a[0, :]
-        c[:, width - 1] = a[:, width - 1]
-        d = np.roll(np.roll(a, 1, axis=0), -1, axis=1)
-        d[height - 1, :] = a[height - 1, :]
-        d[:, 0] = a[:, 0]
-        mask = (a > np.maximum(c, d)) & (c != d)
-        b[mask] -= np.sign(c[mask] - d[mask])
-
-        return b.astype(np.uint8)
-
-    img_adjusted = img.copy()
-    for _ in range(iterations):  
-        img_adjusted = adjust_dark_pixels(img_adjusted)
-        img_adjusted = adjust_light_pixels(img_adjusted)
-    return img_adjusted
-
+@profiling.profiled("opening")
 def apply_opening(img, kernel_size):
     """Applies the opening morphological operation."""
-    kernel = np.ones((kernel_size, kernel_size), np.uint8)
-    return cv2.morphologyEx(img, cv2.MORPH_OPEN, kernel)
+    return morphology.opening(img, morphology.square(kernel_size))
 
+@profiling.profiled("closing")
 def apply_closing(img, kernel_size):
     """Applies the closing morphological operation."""
-    kernel = np.ones((kernel_size, kernel_size), np.uint8)
-    return cv2.morphologyEx(img, cv2.MORPH_CLOSE, kernel)
+    return morphology.closing(img, morphology.square(kernel_size))
 
 def apply_my_method(img, crimmins_iterations=3, opening_kernel_size=3, closing_kernel_size=3):
     """
@@ -135,19 +50,34 @@ def apply_my_method(img, crimmins_iterations=3, opening_kernel_size=3, closing_k
     This is 'myMethod'.
     """
     img_crimmins = apply_crimmins_speckle_removal(img, iterations=crimmins_iterations)
+    return finish_my_method(img_crimmins, opening_kernel_size, closing_kernel_size)
+
+def finish_my_method(img_crimmins, opening_kernel_size=3, closing_kernel_size=3):
+    """Morphological part of 'myMethod', applied to an already Crimmins-filtered image."""
     img_opening = apply_opening(img_crimmins, kernel_size=opening_kernel_size)
     img_closing = apply_closing(img_opening, kernel_size=closing_kernel_size)
     return img_closing
 
+@profiling.profiled("difference")
 def calculate_difference_image(original_img, processed_img):
     """Calculates the difference between two images and normalizes the result for display."""
-    diff = original_img.astype(np.int16) - processed_img.astype(np.int16)
-    diff = np.abs(diff)
-    diff_normalized = cv2.normalize(diff, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
-    return diff_normalized
+    return metrics.normalized_difference(cv2.absdiff(original_img, processed_img))
+
+@profiling.profiled("difference")
+def compare_filters(original_img, processed):
+    """Difference images and quality metrics for every filter output, sharing the original's terms."""
+    return metrics.compare_outputs(original_img, processed)
+
+def print_metrics(filename, records):
+    """Print one line of quality metrics per filter."""
+    print(f"{filename}: {'PSNR dB':>8} {'SSIM':>6} {'resid var':>10} {'edges':>6}")
+    for name, record in records.items():
+        print(f"{name:>12} {record['psnr']:>8.2f} {record['ssim']:>6.3f} {record['residual_variance']:>10.1f} "
+              f"{record['edge_preservation']:>6.3f}")
 
-def on_image_click(event, images, fig):
+def on_image_click(event, images, fig, figure_mode="mosaic", composites=None):
     """Identify the clicked image and process it."""
+    import matplotlib.pyplot as plt
     if event.xdata is not None and event.ydata is not None:
         num_images = len(images)
         fig_width = fig.get_size_inches()[0] * fig.dpi  # Get figure width in pixels
@@ -158,10 +88,11 @@ def on_image_click(event, images, fig):
         if 0 <= index < num_images:
             filename, img = images[index]
             plt.close(fig)
-            process_and_show(filename, img)
+            process_and_show(filename, img, figure_mode, composites)
 
-def show_initial_selection(images):
+def show_initial_selection(images, figure_mode="mosaic", composites=None):
     """Display initial selection window with 3 random images side by side."""
+    import matplotlib.pyplot as plt
     fig, axes = plt.subplots(1, len(images), figsize=(7, 3))
 
     for i, (filename, img) in enumerate(images):
@@ -170,40 +101,56 @@ def show_initial_selection(images):
         axes[i].axis("off")
 
     plt.figtext(0.5, 0.01, "Click on an image to proceed", ha="center", fontsize=10)
-    fig.canvas.mpl_connect('button_press_event', lambda event: on_image_click(event, images, fig))
+    fig.canvas.mpl_connect('button_press_event', lambda event: on_image_click(event, images, fig, figure_mode, composites))
     plt.show()
 
-def process_and_show(filename, img):
+# Filter parameters - Tuned for speckle removal and detail preservation
+MEDIAN_KERNEL_SIZE = 5
+BILATERAL_KERNEL_SIZE = 15
+BILATERAL_SIGMA_COLOR = 75
+BILATERAL_SIGMA_SPACE = 15
+CRIMMINS_ITERATIONS = 3
+OPENING_KERNEL_SIZE = 3
+CLOSING_KERNEL_SIZE = 3
+
+def apply_speckle_filters(img):
+    """Applies every speckle filter to the image and returns the outputs by name."""
+    processed_crimmins = apply_crimmins_speckle_removal(img, iterations=CRIMMINS_ITERATIONS)
+    return {
+        "median": apply_median_filter(img, MEDIAN_KERNEL_SIZE),
+        "bilateral": apply_bilateral_filter(img, BILATERAL_KERNEL_SIZE, BILATERAL_SIGMA_COLOR,
+                                            BILATERAL_SIGMA_SPACE),
+        "crimmins": processed_crimmins,
+        # myMethod starts from the Crimmins result instead of recomputing it
+        "mymethod": finish_my_method(processed_crimmins, OPENING_KERNEL_SIZE, CLOSING_KERNEL_SIZE),
+    }
+
+def comparison_rows(img, processed, diffs):
+    """Layout of the comparison figure: filtered images on top, what each filter removed below."""
+    return [
+        [("Original", img), ("Median Filtered", processed["median"]),
+         ("Bilateral Filtered", processed["bilateral"]), ("Crimmins Filtered", processed["crimmins"]),
+         ("My Method", processed["mymethod"])],
+        [("Original", img), ("Median Removed", diffs["median"]), ("Bilateral Removed", diffs["bilateral"]),
+         ("Crimmins Removed", diffs["crimmins"]), ("My Method Removed", diffs["mymethod"])],
+    ]
+
+def process_and_show(filename, img, figure_mode="mosaic", composites=None):
     """Applies filters and displays the results."""
-    img = preprocess_image(img)
+    with profiling.image(filename):
+        img = preprocess_image(img)
+        processed = apply_speckle_filters(img)
+        diffs, records = compare_filters(img, processed)
 
-    # Filter parameters - Tuned for speckle removal and detail preservation
-    median_kernel_size = 5
-    bilateral_kernel_size = 15
-    bilateral_sigma_color = 75
-    bilateral_sigma_space = 15
-    crimmins_iterations = 3
-    opening_kernel_size = 3
-    closing_kernel_size = 3
+    print_metrics(filename, records)
+    display_results(filename, comparison_rows(img, processed, diffs), figure_mode, composites)
 
-    processed_median = apply_median_filter(img, median_kernel_size)
-    processed_bilateral = apply_bilateral_filter(img, bilateral_kernel_size, bilateral_sigma_color,
-                                                bilateral_sigma_space)
-    processed_crimmins = apply_crimmins_speckle_removal(img, iterations=crimmins_iterations)
-    processed_mymethod = apply_my_method(img, crimmins_iterations=crimmins_iterations,
-                                          opening_kernel_size=opening_kernel_size,
-                                          closing_kernel_size=closing_kernel_size)
+def save_plot(rows, filename, fig=None, composites=None):
+    """Save the comparison to the output_task_2 folder: the cv2 mosaic, or the matplotlib figure when given.
 
-    diff_median = calculate_difference_image(img, processed_median)
-    diff_bilateral = calculate_difference_image(img, processed_bilateral)
-    diff_crimmins = calculate_difference_image(img, processed_crimmins)
-    diff_mymethod = calculate_difference_image(img, processed_mymethod)
-
-    display_results(filename, img, processed_median, processed_bilateral, processed_crimmins,
-                    processed_mymethod, diff_median, diff_bilateral, diff_crimmins, diff_mymethod)
-
-def save_plot(fig, filename):
-    """Save the current plot to the output_task_2 folder."""
+    The mosaic is queued on composites, a composite.CompositeWriter, so the
+    window closes without waiting for the encode.
+    """
     output_folder = "output_task_2"
     # Ensure the folder exists
     if not os.path.exists(output_folder):
@@ -211,64 +158,46 @@ def save_plot(fig, filename):
     
     # Set the full path for saving the plot
     plot_filename = os.path.join(output_folder, filename + "_processed.png")
-    fig.savefig(plot_filename)
-    print(f"Plot saved as {plot_filename}")
-
-def display_results(filename, original_img, processed_median, processed_bilateral, processed_crimmins, processed_mymethod,
-                    diff_median, diff_bilateral, diff_crimmins, diff_mymethod):
+    if fig is None:
+        composites.submit(plot_filename, rows, filename, image=filename)
+        print(f"Plot queued as {plot_filename}")
+    else:
+        with profiling.image(filename), profiling.stage("savefig"):
+            fig.savefig(plot_filename)
+        print(f"Plot saved as {plot_filename}")
+
+def display_results(filename, rows, figure_mode="mosaic", composites=None):
     """Displays the original image, processed images, and difference images."""
-    fig, axes = plt.subplots(2, 5, figsize=(20, 8))  # Adjusted for "myMethod"
-
-    axes[0, 0].imshow(original_img, cmap='gray')
-    axes[0, 0].set_title("Original", fontsize=10)
-    axes[0, 0].axis("off")
-
-    axes[0, 1].imshow(processed_median, cmap='gray')
-    axes[0, 1].set_title("Median Filtered", fontsize=10)
-    axes[0, 1].axis("off")
-
-    axes[0, 2].imshow(processed_bilateral, cmap='gray')
-    axes[0, 2].set_title("Bilateral Filtered", fontsize=10)
-    axes[0, 2].axis("off")
-
-    axes[0, 3].imshow(processed_crimmins, cmap='gray')
-    axes[0, 3].set_title("Crimmins Filtered", fontsize=10)
-    axes[0, 3].axis("off")
+    import matplotlib.pyplot as plt
+    with profiling.stage("figure_render", image=filename):
+        fig = composite.figure(rows, figsize=(20, 8))  # Adjusted for "myMethod"
 
-    axes[0, 4].imshow(processed_mymethod, cmap='gray')
-    axes[0, 4].set_title("My Method", fontsize=10)
-    axes[0, 4].axis("off")
-    
-    axes[1, 0].imshow(original_img, cmap='gray')
-    axes[1, 0].set_title("Original", fontsize=10)
-    axes[1, 0].axis("off")
-
-    axes[1, 1].imshow(diff_median, cmap='gray')
-    axes[1, 1].set_title("Median Removed", fontsize=10)
-    axes[1, 1].axis("off")
-
-    axes[1, 2].imshow(diff_bilateral, cmap='gray')
-    axes[1, 2].set_title("Bilateral Removed", fontsize=10)
-
-    axes[1, 3].imshow(diff_crimmins, cmap='gray')
-    axes[1, 3].set_title("Crimmins Removed", fontsize=10)
-
-    axes[1, 4].imshow(diff_mymethod, cmap='gray')
-    axes[1, 4].set_title("My Method Removed", fontsize=10)
-
-    plt.tight_layout()
-
-    # Save the figure after closing
+    # Save after closing; the window itself always uses matplotlib
     def on_close(event):
-        save_plot(fig, filename)
+        save_plot(rows, filename, fig if figure_mode == "matplotlib" else None, composites)
 
     # Register the close event
     fig.canvas.mpl_connect('close_event', on_close)
     
     plt.show()
+
 def main():
+    parser = argparse.ArgumentParser(description="Speckle filters on noisy images.")
+    parser.add_argument("--profile", metavar="DIR", help="Write stage traces and a summary to DIR on exit")
+    parser.add_argument("--figure", choices=["mosaic", "matplotlib"], default="mosaic",
+                        help="How the saved comparison is rendered: fast cv2 mosaic or matplotlib figure")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable()
     images = load_images("noisy/speckle")  
-    show_initial_selection(images)
+    with composite.CompositeWriter() as composites:  # Closing waits for the queued mosaics
+        show_initial_selection(images, args.figure, composites)
+    for path in composites.written:
+        print(f"Plot saved as {path}")
+    if args.profile:
+        profiler = profiling.disable()
+        profiler.write(args.profile)
+        profiler.print_summary()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,53 +1,113 @@
-import pydicom
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.widgets import Slider
-import requests
-import io
+import argparse
+from dicom_index import INDEX_PATH, DicomIndex, add_query_arguments, query_filters
+from dicom_volume import DicomVolume, fetch_dicom
 
 # Google Drive direct download link
-dicom_url = "https://drive.google.com/uc?id=1eY2JnfI9RnYeT6ItZ_Fn_Yh3JXpAD-jC"
-
-# Download the DICOM file
-response = requests.get(dicom_url)
-response.raise_for_status()  # Ensure request was successful
-dicom_data = pydicom.dcmread(io.BytesIO(response.content))
-
-# Extract and normalize pixel data
-image_data = dicom_data.pixel_array.astype(np.float32)
-image_data = (image_data - np.min(image_data)) / (np.max(image_data) - np.min(image_data))  # Normalize to [0,1]
-
-# Extract metadata dynamically (excluding pixel data)
-metadata = {elem.keyword: getattr(dicom_data, elem.keyword, "Not Available")
-            for elem in dicom_data if elem.keyword and elem.keyword != "PixelData"}
-
-# Print metadata to console
-print("\n=== DICOM Metadata ===")
-for key, value in metadata.items():
-    print(f"{key}: {value}")
-
-# Set up figure
-fig, ax = plt.subplots(figsize=(6, 6))
-plt.subplots_adjust(left=0.1, bottom=0.25)
-
-# Display first slice
-colormap = 'inferno'
-im = ax.imshow(image_data[0], cmap=colormap)
-ax.set_title("MRI Slice Viewer")
-ax.axis('off')
-
-# Create slider for navigating slices
-ax_slider = plt.axes([0.1, 0.1, 0.8, 0.05], facecolor='lightgray')
-slider = Slider(ax_slider, "Slice", 0, image_data.shape[0] - 1, valinit=0, valstep=1)
-
-# Function to update displayed slice
-def update(val):
-    slice_index = int(slider.val)
-    im.set_array(image_data[slice_index])
-    ax.set_title(f"Slice {slice_index + 1} / {image_data.shape[0]}")
-    fig.canvas.draw_idle()
-
-# Connect slider to update function
-slider.on_changed(update)
-
-plt.show()
+DICOM_URL = "https://drive.google.com/uc?id=1eY2JnfI9RnYeT6ItZ_Fn_Yh3JXpAD-jC"
+DICOM_CACHE = "dicom_cache/mri.dcm"
+
+def open_volume(path=None, url=DICOM_URL, cache=DICOM_CACHE):
+    """Open a local DICOM file, or download the MRI once to cache and open that copy."""
+    return DicomVolume(path or fetch_dicom(url, cache))
+
+def print_metadata(volume):
+    """Print all header elements except the pixel data."""
+    print("\n=== DICOM Metadata ===")
+    for key, value in volume.metadata().items():
+        print(f"{key}: {value}")
+
+def open_series(folder, plane="axial"):
+    """One plane of a DICOM series directory (see dicom_series.py)."""
+    from dicom_series import DicomSeries
+    return DicomSeries(folder).plane(plane)
+
+def open_indexed(filters, index_path=INDEX_PATH, plane="axial"):
+    """First series in the DICOM index matching filters, e.g. {"patient_id": "P1"}."""
+    with DicomIndex(index_path) as index:
+        matches = index.series(**filters)
+        if not matches:
+            raise SystemExit(f"No indexed series matches {filters}")
+        if len(matches) > 1:
+            print(f"{len(matches)} series match, opening {matches[0]['series_uid']}")
+        files = index.series_files(matches[0]["series_uid"])
+    if len(files) == 1:  # One multi-frame file
+        return DicomVolume(files[0])
+    return open_series(files, plane)
+
+def show_viewer(volume, colormap='inferno', aspect="equal"):
+    """Slice viewer with a slider; reports frame latency when the window is closed."""
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import Slider
+    from slice_renderer import SliceRenderer
+
+    # Set up figure
+    fig, ax = plt.subplots(figsize=(6, 6))
+    plt.subplots_adjust(left=0.1, bottom=0.25)
+
+    # Display first slice
+    renderer = SliceRenderer(volume, cmap=colormap)  # Pre-colormapped frames, cached and prefetched
+    im = ax.imshow(renderer.get(0), aspect=aspect)
+    ax.set_title("MRI Slice Viewer")
+    ax.axis('off')
+
+    # Create slider for navigating slices
+    ax_slider = plt.axes([0.1, 0.1, 0.8, 0.05], facecolor='lightgray')
+    slider = Slider(ax_slider, "Slice", 0, len(volume) - 1, valinit=0, valstep=1)
+
+    # Function to update displayed slice
+    def update(val):
+        slice_index = int(slider.val)
+        im.set_array(renderer.get(slice_index))
+        ax.set_title(f"Slice {slice_index + 1} / {len(volume)}")
+        fig.canvas.draw_idle()
+
+    # Connect slider to update function
+    slider.on_changed(update)
+
+    # Report how quickly frames were served while scrubbing
+    def report_latency(event):
+        stats = renderer.latency_report()
+        renderer.close()
+        if stats:
+            print(f"\nFrame latency over {stats['frames']} frames: p50 {stats['p50']:.2f} ms, "
+                  f"p90 {stats['p90']:.2f} ms, p99 {stats['p99']:.2f} ms")
+
+    fig.canvas.mpl_connect('close_event', report_latency)
+
+    plt.show()
+
+def main():
+    parser = argparse.ArgumentParser(description="MRI slice viewer.")
+    parser.add_argument("--dicom", metavar="PATH", help="Local DICOM file to open (no download)")
+    parser.add_argument("--series", metavar="DIR", help="DICOM series directory, one file per slice")
+    parser.add_argument("--plane", choices=["axial", "coronal", "sagittal"], default="axial",
+                        help="Plane to scroll through for a series")
+    parser.add_argument("--url", default=DICOM_URL, help="Where to download the MRI when --dicom is not given")
+    parser.add_argument("--cache", default=DICOM_CACHE, help="Local copy of the downloaded file")
+    parser.add_argument("--cmap", default="inferno")
+    parser.add_argument("--index", metavar="DB", default=INDEX_PATH,
+                        help="DICOM index searched by --patient-id/--study-uid/--series-uid/--modality")
+    add_query_arguments(parser)
+    args = parser.parse_args()
+
+    filters = query_filters(args)
+    if filters:
+        # Opened by query against the index built with `python dicom_index.py scan FOLDER`
+        volume = open_indexed(filters, args.index, args.plane)
+        if isinstance(volume, DicomVolume):
+            print_metadata(volume)
+        show_viewer(volume, args.cmap, getattr(volume, "aspect", "equal"))
+        return
+    if args.series:
+        # Copied once into a memory-mapped volume; every plane is a view of it
+        plane = open_series(args.series, args.plane)
+        print(f"{len(plane.series.files)} files, volume {plane.series.shape}, spacing {plane.series.spacing} mm")
+        show_viewer(plane, args.cmap, plane.aspect)
+        return
+    # Frames are decoded lazily, so opening the volume reads only the header
+    volume = open_volume(args.dicom, args.url, args.cache)
+    print_metadata(volume)
+    show_viewer(volume, args.cmap)
+
+if __name__ == "__main__":
+    main()
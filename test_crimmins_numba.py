@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+import pytest
+
+pytest.importorskip("numba")
+
+# Runs in a fresh interpreter: NUMBA_CACHE_DIR only takes effect before numba is imported
+WORKER_THREAD_CALL = """
+import threading
+import numpy as np
+import crimmins
+import crimmins_numba
+
+img = np.random.default_rng(0).integers(0, 256, (64, 64)).astype(np.uint8)
+expected = crimmins.crimmins_speckle_removal(img, 3, "numba")  # Compiles the parallel build first
+result = []
+thread = threading.Thread(target=lambda: result.append(crimmins.crimmins_speckle_removal(img, 3, "numba")))
+thread.start()
+thread.join()
+assert np.array_equal(result[0], expected)
+
+serial = crimmins_numba.crimmins_serial
+assert len(serial.signatures) == 1, serial.signatures
+assert not serial.targetoptions.get("parallel"), serial.targetoptions
+assert not serial.stats.cache_hits, "serial kernel was loaded from the parallel build's cache entry"
+assert not serial.overloads[serial.signatures[0]].metadata["parfors"], "serial kernel was compiled with parfors"
+"""
+
+def test_worker_threads_get_serial_build(tmp_path):
+    env = dict(os.environ, NUMBA_CACHE_DIR=str(tmp_path))
+    subprocess.run([sys.executable, "-c", WORKER_THREAD_CALL], check=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
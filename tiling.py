@@ -0,0 +1,123 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+DEFAULT_TILE_SIZE = 1024
+
+def tile_filters():
+    """Tile-safe filters: name -> (function, halo in pixels).
+
+    The halo is how far a filter reads around each output pixel, so a tile
+    padded by it produces exactly the same interior as the whole image.
+    """
+    import task_1_blurring
+    import task_1_denoise
+    import task_2_speckle as speckle
+
+    crimmins_halo = 2 * speckle.CRIMMINS_ITERATIONS  # Dark and light pass each read 1 px
+    return {
+        "median": (lambda img: speckle.apply_median_filter(img, speckle.MEDIAN_KERNEL_SIZE),
+                   speckle.MEDIAN_KERNEL_SIZE // 2),
+        "bilateral": (lambda img: speckle.apply_bilateral_filter(
+                          img, speckle.BILATERAL_KERNEL_SIZE, speckle.BILATERAL_SIGMA_COLOR,
+                          speckle.BILATERAL_SIGMA_SPACE),
+                      speckle.BILATERAL_KERNEL_SIZE // 2),
+        "crimmins": (lambda img: speckle.apply_crimmins_speckle_removal(
+                         img, iterations=speckle.CRIMMINS_ITERATIONS),
+                     crimmins_halo),
+        "mymethod": (lambda img: speckle.apply_my_method(
+                         img, speckle.CRIMMINS_ITERATIONS, speckle.OPENING_KERNEL_SIZE,
+                         speckle.CLOSING_KERNEL_SIZE),
+                     crimmins_halo + speckle.OPENING_KERNEL_SIZE + speckle.CLOSING_KERNEL_SIZE),
+        # Search window 21 plus template window 7
+        "nlm": (task_1_denoise.denoise_image, 21 // 2 + 7 // 2),
+        "enhance_closing": (task_1_denoise.enhance_lines_closing, 3),
+        # Blur 3x3 then closing K=3; preprocess_image needs the global mean and is applied separately
+        "blur_closing": (lambda img: task_1_blurring.apply_closing(task_1_blurring.apply_blur(img), 3), 1 + 3),
+    }
+
+def iter_tiles(shape, tile_size, halo):
+    """Yield (source slice, output slice, crop inside the padded tile) for each tile."""
+    height, width = shape
+    for top in range(0, height, tile_size):
+        for left in range(0, width, tile_size):
+            bottom, right = min(top + tile_size, height), min(left + tile_size, width)
+            src_top, src_left = max(top - halo, 0), max(left - halo, 0)
+            src_bottom, src_right = min(bottom + halo, height), min(right + halo, width)
+            yield ((slice(src_top, src_bottom), slice(src_left, src_right)),
+                   (slice(top, bottom), slice(left, right)),
+                   (slice(top - src_top, bottom - src_top), slice(left - src_left, right - src_left)))
+
+def process_tiled(src, func, halo, tile_size=DEFAULT_TILE_SIZE, out=None, workers=1):
+    """Apply func tile by tile and stitch the interiors into out.
+
+    src can be any 2-D array-like that supports slicing, e.g. a memmap, so
+    only one padded tile per worker is resident at a time.
+    """
+    if out is None:
+        out = np.empty(src.shape, np.uint8)
+
+    def run(tile):
+        read, write, crop = tile
+        result = func(np.ascontiguousarray(src[read]))
+        out[write] = result[crop]
+
+    tiles = iter_tiles(src.shape, tile_size, halo)
+    if workers > 1:
+        with ThreadPoolExecutor(workers) as pool:  # OpenCV and the numba kernel release the GIL
+            for _ in pool.map(run, tiles):
+                pass
+    else:
+        for tile in tiles:
+            run(tile)
+    return out
+
+def open_source(path):
+    """Open an image for tiled reading without decoding it into RAM where possible.
+
+    .npy files and uncompressed TIFFs are memory-mapped; other formats have
+    to be decoded by OpenCV in full.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        return np.load(path, mmap_mode="r")
+    if extension in (".tif", ".tiff"):
+        try:
+            import tifffile
+            return tifffile.memmap(path, mode="r")
+        except (ImportError, ValueError):
+            pass  # tifffile missing or the TIFF is compressed
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise OSError(f"Could not read {path}")
+    return img
+
+def open_output(path, shape):
+    """Memory-mapped .npy output, so the result never has to fit in RAM."""
+    return np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=shape)
+
+def main():
+    filters = tile_filters()
+    parser = argparse.ArgumentParser(description="Run a filter over a large image tile by tile.")
+    parser.add_argument("filter", choices=sorted(filters))
+    parser.add_argument("input", help=".npy, .tif or any image OpenCV can read")
+    parser.add_argument("output", help="Output .npy file (memory-mapped)")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    func, halo = filters[args.filter]
+    src = open_source(args.input)
+    out = open_output(args.output, src.shape)
+    start = time.perf_counter()
+    process_tiled(src, func, halo, args.tile_size, out, args.workers)
+    out.flush()
+    seconds = time.perf_counter() - start
+    print(f"{args.filter}: {src.shape[1]}x{src.shape[0]} in {seconds:.2f}s "
+          f"({src.size / 1e6 / seconds:.2f} MP/s, tile {args.tile_size}, halo {halo})")
+
+if __name__ == "__main__":
+    main()